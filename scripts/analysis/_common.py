@@ -0,0 +1,149 @@
+"""解析スクリプト共有のヘルパ。
+
+summary.json のロードと (tag, profile) index の組み立てが
+summarize_avoidance / summarize_true_blunders で重複していたため、
+ここへ一本化する。各スクリプトは 1 回のロードで index を受け取り、
+行 list の線形走査を繰り返さない。
+
+targets.json の逐次書き（JsonArrayWriter）・一括書き（dump_targets）と
+スパイク抽出（compute_spikes / chops）も make_targets_from_logs /
+make_targets_from_moves / expand_targets_back / extract_positions_from_log
+で verbatim 重複していたため、同様にここへ一本化する。ストリーミング等の
+改修を片方だけに当てる事故を防ぐ。
+"""
+
+import array
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:  # numpy なし環境では純 Python パスへフォールバック
+    np = None
+
+try:
+    import orjson
+except ImportError:  # orjson なし環境では stdlib json へフォールバック
+    orjson = None
+
+
+def jload(path):
+    """JSON ファイルを読む（orjson があれば bytes 経由の fast path）。"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_summary_indexed(outdir, summary=None):
+    """summary.json を 1 回読み、(rows, cp_idx, full_idx) を返す。
+
+    cp_idx は {(tag, profile): eval_cp}、full_idx は {(tag, profile): row}。
+    """
+    path = summary or os.path.join(outdir, "summary.json")
+    rows = jload(path)["results"]
+    cp_idx = {}
+    full_idx = {}
+    for r in rows:
+        key = (r["tag"], r["profile"])
+        cp_idx[key] = r.get("eval_cp")
+        full_idx[key] = r
+    return rows, cp_idx, full_idx
+
+
+def dump_targets(targets, out_path):
+    """targets.json を一括 serialize して 1 回の write で書く（orjson は C レベル）。
+
+    件数が入力規模に比例しない小さな targets 向け。大量件数を書く側は
+    JsonArrayWriter の逐次書きを使うこと。
+    """
+    if orjson is not None:
+        with open(out_path, "wb", buffering=1 << 20) as wf:
+            wf.write(orjson.dumps({"targets": targets}, option=orjson.OPT_INDENT_2))
+    else:
+        with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as wf:
+            wf.write(json.dumps({"targets": targets}, indent=2, ensure_ascii=False))
+
+
+class JsonArrayWriter:
+    """`{"targets": [...]}` を逐次書きする context manager。
+
+    accumulate-and-dump だとターゲット数に比例してピークメモリが膨らむ
+    （数百万件で GB 級）。1 件 serialize するたびに buffered write へ流し、
+    ピークメモリをターゲット数に非依存にする。
+    """
+
+    def __init__(self, out_path):
+        self._f = open(out_path, "wb", buffering=1 << 20)
+        self._first = True
+        self.count = 0
+
+    def __enter__(self):
+        self._f.write(b'{"targets": [')
+        return self
+
+    def write(self, target):
+        if orjson is not None:
+            blob = orjson.dumps(target)
+        else:
+            blob = json.dumps(target, ensure_ascii=False).encode("utf-8")
+        self._f.write(b"\n" if self._first else b",\n")
+        self._f.write(blob)
+        self._first = False
+        self.count += 1
+
+    def __exit__(self, *exc):
+        self._f.write(b"\n]}\n" if not self._first else b"]}\n")
+        self._f.close()
+        return False
+
+
+def _as_i32(evals):
+    """評価値列を int32 ndarray 化する。array.array('i') は buffer protocol
+    経由の zero-copy（np.frombuffer）、list 等は従来どおり変換コピー。"""
+    if isinstance(evals, array.array):
+        return np.frombuffer(evals, dtype=np.int32)
+    return np.asarray(evals, dtype=np.int32)
+
+
+def compute_spikes(evals, threshold, topk=None):
+    """評価値列から |delta| >= threshold の (ply, delta) を列挙する（ply は 1 始まり）。"""
+    if np is not None:
+        arr = _as_i32(evals)
+        d = np.diff(arr)
+        idx = np.flatnonzero(np.abs(d) >= threshold)
+        if topk is not None and idx.size > topk:
+            # argpartition は |delta| 同値が topk 境界にかかると任意の部分
+            # 集合を選び、純 Python fallback（安定ソートで ply 昇順優先）と
+            # 食い違う。kind="stable" の argsort で同値は ply 昇順を残す。
+            sel = np.argsort(-np.abs(d[idx]), kind="stable")[:topk]
+            idx = np.sort(idx[sel])
+        return list(zip((idx + 2).tolist(), d[idx].tolist()))
+    spikes = []
+    prev = None
+    for i, sc in enumerate(evals):
+        if prev is not None:
+            d = sc - prev
+            if abs(d) >= threshold:
+                spikes.append((i + 1, d))
+        prev = sc
+    if topk is not None and len(spikes) > topk:
+        spikes = sorted(spikes, key=lambda x: abs(x[1]), reverse=True)[:topk]
+        spikes.sort(key=lambda x: x[0])
+    return spikes
+
+
+def chops(pos_line, ks):
+    """`position ... moves ...` の末尾 k 手を削った局面を k ごとにまとめて作る。
+
+    split はスパイクあたり 1 回。moves 節が無い・k 手に満たない k は
+    先頭（moves 無し）に落ちる。
+    """
+    if " moves " not in pos_line:
+        return {k: pos_line for k in ks}
+    head, moves_str = pos_line.split(" moves ", 1)
+    toks = moves_str.split()
+    return {
+        k: (f"{head} moves {' '.join(toks[:-k])}" if len(toks) > k else head) for k in ks
+    }
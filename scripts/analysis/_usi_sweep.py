@@ -0,0 +1,413 @@
+"""USI エンジンスイープの共有実装。
+
+`run_eval_targets.py`（固定プロファイル）と `run_eval_targets_params.py`
+（任意パラメータセット）がほぼ同一の UsiEngine / reader / 断片実行 /
+summary 追記を重複して抱えていたため、ここへ一本化する。perf 修正を
+二重に当てる必要がなくなるのが主目的で、両スクリプトは CLI の薄い
+wrapper になる。
+
+profile_specs は (name, 追加 setoption, 追加環境変数) のリスト。envadd は
+プロセス起動時にしか反映できないため setoption と別枠で持つ。
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+ENGINE = os.environ.get("ENGINE_BIN", "target/release/engine-usi")
+
+# stdbuf の有無はプロセス内で不変なので stat(2) は起動時の 1 回だけ。
+# stdbuf 自体はエンジン側 stdout の行バッファ化のため維持する（reader は
+# 受け側の話で、エンジンがブロックバッファだと info が遅延到着する）。
+_STDBUF = ["/usr/bin/stdbuf", "-oL", "-eL"] if os.path.exists("/usr/bin/stdbuf") else []
+
+# info 行の cp/depth 抽出（bytes のまま照合し decode を省く）。per-line の
+# re.search 呼び出しで毎回 regex キャッシュを引かないよう module scope で
+# 1 回だけコンパイルする。
+_RE_INFO_CP = re.compile(rb"info depth (\d+).*?score cp ([+-]?\d+)")
+
+
+def build_common(threads, minthink, hash_mib):
+    """全エンジン共通の setoption 辞書を返す。"""
+    return {
+        "Threads": str(threads),
+        "USI_Hash": str(hash_mib),
+        "MinimumThinkingTime": str(minthink),
+    }
+
+
+def _total_ram_mib():
+    """搭載 RAM (MiB)。取れない環境では None。"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1 << 20)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def resolve_hash_mib(hash_arg, jobs):
+    """--hash 未指定時の USI_Hash (MiB) を決める。
+
+    並列時は jobs 個のエンジンが同時に TT を確保するため、RAM の半分を
+    jobs で割った値に抑える（下限 64 MiB、上限は単発時の既定 256 MiB）。
+    """
+    if hash_arg is not None:
+        return hash_arg
+    if jobs > 1:
+        total = _total_ram_mib()
+        if total is not None:
+            return max(64, min(256, int(total * 0.5 // jobs)))
+    return 256
+
+
+class EngineReader(threading.Thread):
+    """エンジン stdout を blocking readline で読み、ログ書き込みと cp/depth
+    抽出をその場で行う reader スレッド。
+
+    行を list に貯めて後から再走査すると、ログ全体をメモリに保持した上で
+    同じバイト列を二度触ることになる。読んだ行はその場で logfile へ
+    追記し、_RE_INFO_CP の一致で last_cp / last_depth を更新する
+    （1 パスで I/O とパースを融合）。パースは bytes のまま行い、UTF-8
+    decode は待ち合わせ用 Queue へ渡す行にのみ払う。
+
+    bestmove 行を Queue から取り出した時点で、それ以前の行の書き込みと
+    パースは完了している（put より前に処理するため）。
+    """
+
+    def __init__(self, p, logfile):
+        super().__init__(daemon=True)
+        self._stdout = p.stdout
+        self._wf = open(logfile, "wb", buffering=1 << 16)
+        self.q = queue.Queue()
+        self.last_cp = None
+        self.last_depth = 0
+        self.last_info = None
+        self.last_bestmove = None
+        self.start()
+
+    def reset_score(self):
+        """go の前に呼び、前回評価の cp/depth 等を持ち越さないようにする。"""
+        self.last_cp = None
+        self.last_depth = 0
+        self.last_info = None
+        self.last_bestmove = None
+
+    def run(self):
+        wf = self._wf
+        for raw in iter(self._stdout.readline, b""):
+            wf.write(raw)
+            if raw.startswith(b"info") and b"score" in raw:
+                self.last_info = raw.decode("utf-8", "ignore").rstrip()
+                m = _RE_INFO_CP.search(raw)
+                if m:
+                    d = int(m.group(1))
+                    if d >= self.last_depth:
+                        self.last_depth = d
+                        self.last_cp = int(m.group(2))
+            elif raw.startswith(b"bestmove"):
+                parts = raw.split()
+                if len(parts) > 1:
+                    self.last_bestmove = parts[1].decode("ascii", "ignore")
+            self.q.put(raw.decode("utf-8", "ignore").rstrip("\r\n"))
+        wf.close()
+
+
+def _read_until(reader, patterns, timeout):
+    """patterns のいずれかを含む行が reader から届くまで待つ。
+
+    timeout 秒までに一致しなければ False。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        try:
+            ln = reader.q.get(timeout=remaining)
+        except queue.Empty:
+            return False
+        if any(pat in ln for pat in patterns):
+            return True
+
+
+class UsiEngine:
+    """1 プロセスのエンジンを複数局面で使い回す USI クライアント。
+
+    局面ごとのプロセス起動は USI 初期化・USI_Hash の確保（1 GiB 級の
+    ゼロ埋め）・NNUE ロードを毎回払う。起動と setoption を 1 回で済ませ、
+    以降は usinewgame + position + go だけを回す。envadd はプロセス
+    起動時にしか反映できないため、envadd が異なるプロファイルは別
+    インスタンスを作ること。
+    """
+
+    def __init__(self, opts, envadd, logfile):
+        cmd = [*_STDBUF, ENGINE]
+        # envadd が空（base / rootfull）なら env=None で親環境をそのまま
+        # 継承し、~100 キーの environ 複製を省く。非空時のみマージ dict を作る。
+        env = {**os.environ, **envadd} if envadd else None
+        # close_fds=False で subprocess の posix_spawn 高速パスに乗せる
+        # （既定の close_fds=True は fork + execve 経路になり、大きな親
+        # プロセスではページテーブル複製を払う）。Python 3.4+ で fd は
+        # 既定非継承なので、明示的に閉じなくてもエンジンへは漏れない。
+        self.p = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=env,
+            close_fds=False,
+        )
+        self.reader = EngineReader(self.p, logfile)
+        self._send("usi")
+        _read_until(self.reader, ["usiok"], 10.0)
+        # setoption 群は 1 つの bytes blob に連結して 1 write / 1 flush で
+        # 送る（応答を待たないコマンド列に N 回の syscall を払わない）。
+        blob = b"".join(
+            f"setoption name {k} value {v}\n".encode() for k, v in opts.items()
+        )
+        self.p.stdin.write(blob + b"isready\n")
+        self.p.stdin.flush()
+        _read_until(self.reader, ["readyok"], 60.0)
+        self._started = False
+
+    def _send(self, s):
+        self.p.stdin.write((s + "\n").encode())
+        self.p.stdin.flush()
+
+    def evaluate(self, position, byoyomi_ms, fresh_tt=False):
+        """1 局面を go byoyomi で評価し (cp, depth, ok) を返す。
+
+        既定では 2 局面目以降 usinewgame を送らず TT を持ち越す（back 展開
+        由来の類似局面が多く、warm TT の恩恵が大きい）。局面間を厳密に
+        独立させたい回帰用途では fresh_tt=True で毎回 TT をクリアする。
+        """
+        # 応答を待たない usinewgame / position / go は 1 write / 1 flush に
+        # まとめて pipe への syscall を減らす（setoption の blob 化と同様）。
+        cmds = []
+        if fresh_tt or not self._started:
+            cmds.append(b"usinewgame\n")
+            self._started = True
+        self.reader.reset_score()
+        cmds.append(position.encode() + b"\n")
+        cmds.append(f"go byoyomi {byoyomi_ms}\n".encode())
+        self.p.stdin.write(b"".join(cmds))
+        self.p.stdin.flush()
+        got = _read_until(self.reader, ["bestmove"], byoyomi_ms / 1000.0 + 30.0)
+        return self.reader.last_cp, self.reader.last_depth, got
+
+    def close(self):
+        # quit 後の「空パターン読み捨て」は実質 0.2 秒 sleep でしかない。
+        # stdin を閉じて EOF を伝え、残りの stdout は reader スレッドが
+        # 吸い切る（join で待つ）。
+        try:
+            self._send("quit")
+            self.p.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.p.wait(timeout=1.5)
+        except subprocess.TimeoutExpired:
+            self.p.kill()
+            self.p.wait()
+        self.reader.join(timeout=0.5)
+
+
+def run_shard(
+    shard,
+    prof_name,
+    prof_opts,
+    envadd,
+    shard_idx,
+    outdir,
+    byoyomi_ms,
+    threads,
+    minthink,
+    hash_mib,
+    fresh_tt,
+):
+    """1 プロファイルのターゲット断片を 1 エンジンで順に評価する worker。"""
+    opts = build_common(threads, minthink, hash_mib)
+    opts.update(prof_opts)
+    logname = f"{prof_name}_w{shard_idx}.log"
+    eng = UsiEngine(opts, envadd, os.path.join(outdir, logname))
+    recs = []
+    restarts = 0
+    try:
+        for t in shard:
+            cp, depth, got = eng.evaluate(t["position"], byoyomi_ms, fresh_tt)
+            recs.append(
+                {
+                    "tag": t["tag"],
+                    "profile": prof_name,
+                    "eval_cp": cp,
+                    "depth": depth,
+                    "ok": got,
+                    "log": logname,
+                }
+            )
+            if not got:
+                # bestmove 未着のままエンジンを使い回すと、遅れて届いた
+                # bestmove が次の _read_until に即マッチし、以降の全ターゲットが
+                # 1 手ずれた応答を ok=True のまま記録し続ける（恒久デシンク）。
+                # 状態不明のプロセスは破棄して張り直す（run_usi_ab_test の
+                # _retire_session と同じ方針）。旧ログは診断用に残すため、
+                # 再起動後は _r<N> 付きの別ログへ書く。
+                eng.close()
+                restarts += 1
+                logname = f"{prof_name}_w{shard_idx}_r{restarts}.log"
+                eng = UsiEngine(opts, envadd, os.path.join(outdir, logname))
+    finally:
+        eng.close()
+    return recs
+
+
+def _worker_init(shard_q, threads):
+    """worker を互いに素な CPU 集合へ pin し、下層のスレッド数も抑える。
+
+    jobs 個のエンジンが Threads 設定を超えてコアを取り合うとスケジューラの
+    thrash で NPS が落ちる。pin は best-effort（キューが尽きた worker や
+    sched_setaffinity の無い環境では何もしない）。
+    """
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["RAYON_NUM_THREADS"] = str(threads)
+    try:
+        shard = shard_q.get_nowait()
+    except queue.Empty:
+        return
+    if shard:
+        try:
+            os.sched_setaffinity(0, set(shard))
+        except (AttributeError, OSError):
+            pass
+
+
+def _split_shards(items, n):
+    """items を n 個までの連続断片に分ける（端数は前詰め、空断片なし）。"""
+    n = max(1, min(n, len(items)))
+    q, r = divmod(len(items), n)
+    shards = []
+    pos = 0
+    for i in range(n):
+        size = q + (1 if i < r else 0)
+        shards.append(items[pos : pos + size])
+        pos += size
+    return shards
+
+
+def run_sweep(
+    targets,
+    profile_specs,
+    outdir,
+    byoyomi_ms=2000,
+    threads=1,
+    minthink=0,
+    hash_arg=None,
+    jobs=None,
+    fresh_tt=False,
+    resume=False,
+    summary_basename="summary",
+    verbose=True,
+):
+    """targets × profile_specs をスイープして summary を書き、結果を返す。
+
+    worker ごとに 1 エンジンを使い回し（起動 + TT 確保 + NNUE ロードは
+    プロファイル×断片あたり 1 回）、完了した run は <basename>.jsonl へ
+    逐次追記する。resume=True なら完了済み (tag, profile) をスキップ。
+    戻り値は (tag, profile) でソートした results のリストで、同名の
+    <basename>.json にも書き出す。
+    """
+    os.makedirs(outdir, exist_ok=True)
+    if jobs is None:
+        # 1 worker = 1 エンジン (threads スレッド)。コアを超えない既定値。
+        jobs = max(1, (os.cpu_count() or 1) // max(1, threads))
+
+    # 完了済み run は jsonl に 1 行ずつ追記されている。クラッシュや OOM で
+    # 中断しても resume で残りだけを回せる。
+    jsonl_path = os.path.join(outdir, f"{summary_basename}.jsonl")
+    done = set()
+    if resume and os.path.exists(jsonl_path):
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:  # 中断で途切れた末尾行は無視
+                    continue
+                done.add((rec["tag"], rec["profile"]))
+    elif os.path.exists(jsonl_path):
+        os.remove(jsonl_path)  # resume なしなら前回の残骸と混ぜない
+
+    shards_per_profile = max(1, jobs // len(profile_specs))
+    tasks = []
+    for name, opts, envadd in profile_specs:
+        remaining = [t for t in targets if (t["tag"], name) not in done]
+        if not remaining:
+            continue
+        for i, shard in enumerate(_split_shards(remaining, shards_per_profile)):
+            tasks.append((shard, name, opts, envadd, i))
+
+    worker = partial(
+        run_shard,
+        outdir=outdir,
+        byoyomi_ms=byoyomi_ms,
+        threads=threads,
+        minthink=minthink,
+        hash_mib=resolve_hash_mib(hash_arg, jobs),
+        fresh_tt=fresh_tt,
+    )
+    with open(jsonl_path, "a", encoding="utf-8") as jf:
+
+        def record(rec):
+            jf.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            jf.flush()  # クラッシュしても完了済み run は失わない
+            if verbose:
+                print(
+                    f"{rec['tag']} [{rec['profile']}] "
+                    f"cp={rec['eval_cp']} depth={rec['depth']}"
+                )
+
+        if jobs > 1 and len(tasks) > 1:
+            # worker ごとに互いに素な CPU shard を配る（initializer は全 worker
+            # 共通なので、shard は Queue 経由で 1 つずつ取らせる）。
+            shard_q = multiprocessing.Queue()
+            for cpu_shard in _split_shards(list(range(os.cpu_count() or 1)), jobs):
+                shard_q.put(cpu_shard)
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_worker_init,
+                initargs=(shard_q, threads),
+            ) as ex:
+                futures = [ex.submit(worker, *t) for t in tasks]
+                for fut in as_completed(futures):
+                    for rec in fut.result():
+                        record(rec)
+        else:
+            for t in tasks:
+                for rec in worker(*t):
+                    record(rec)
+
+    # summary.json は jsonl の読み戻しから組み立てる（resume 分も含む）。
+    # as_completed の完了順に依らず (tag, profile) ソートで安定化する。
+    by_key = {}
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            by_key[(rec["tag"], rec["profile"])] = rec
+    results = sorted(by_key.values(), key=lambda r: (r["tag"], r["profile"]))
+    out_path = os.path.join(outdir, f"{summary_basename}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"results": results}, f, indent=2, ensure_ascii=False)
+    if verbose:
+        print(f"{len(results)} runs -> {out_path}")
+    return results
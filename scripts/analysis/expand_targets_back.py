@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""既存の `targets.json` を back 方向へ追加展開する。
+
+各ターゲットの `position` から更に 1..N 手を削った変種を生成し、
+元ターゲットと合わせた `targets.json` を書き出す。スパイク地点の
+「どこまで遡れば評価が壊れないか」を粗く掃くための補助スクリプト。
+
+使用例:
+    python3 scripts/analysis/expand_targets_back.py targets/targets.json \
+        --out targets_expanded/ --extra-back 3
+"""
+
+import argparse
+import json
+import os
+import sys
+from hashlib import blake2b
+
+from _common import chops, dump_targets
+
+try:
+    import orjson
+except ImportError:  # orjson なし環境では stdlib json へフォールバック
+    orjson = None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("targets", help="入力 targets.json")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument("--extra-back", type=int, default=2, help="追加で遡る最大手数")
+    args = ap.parse_args(argv)
+
+    with open(args.targets, "rb") as f:
+        data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+    base_targets = data["targets"]
+
+    out = []
+    uniq_hashes = set()
+    for t in base_targets:
+        for cand in [t] + [
+            {
+                **t,
+                "tag": f"{t['tag']}_x{k}",
+                "position": pos,
+                "back": int(t.get("back", 0)) + k,
+            }
+            for k, pos in chops(t["position"], range(1, args.extra_back + 1)).items()
+        ]:
+            h = blake2b(cand["position"].encode("ascii"), digest_size=16).digest()
+            if h in uniq_hashes:
+                continue
+            uniq_hashes.add(h)
+            out.append(cand)
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, "targets.json")
+    dump_targets(out, out_path)
+    print(f"{len(base_targets)} -> {len(out)} targets -> {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""USI 対局ログから評価値スパイクを抽出する。
+
+ログ中の `info ... score cp/mate ...` 行と `bestmove` 行を対応付け、
+1 手ごとの最終評価値列を復元して、隣接手の評価値差分が閾値を超える
+「スパイク」手を列挙する。出力は `evals.csv`（全手の評価値推移）と
+`spikes.csv`（スパイク手のみ）。
+
+使用例:
+    python3 scripts/analysis/extract_eval_spikes.py game.log --out out/ --threshold 300
+"""
+
+import argparse
+import array
+import functools
+import mmap
+import os
+import re
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # numpy なし環境では純 Python パスへフォールバック
+    np = None
+
+try:
+    from numba import njit
+except ImportError:  # numba は任意依存（numpy パスで十分動く）
+    njit = None
+
+if np is not None and njit is not None:
+
+    @njit(cache=True, fastmath=False)
+    def _spikes_nb(evals_i32, threshold):
+        """diff・全手 delta・閾値判定を 1 ループに融合した JIT カーネル。
+
+        cache=True で初回コンパイルコストはユーザーごとに 1 回。
+        戻り値は (全手 delta 配列, スパイク ply 配列, スパイク delta 配列)。
+        ply は 1 始まり（最小 2）。deltas[0] は前手が無いため 0。
+        """
+        n = evals_i32.shape[0]
+        deltas = np.zeros(n, np.int32)
+        idx = np.empty(n, np.int64)
+        spk = np.empty(n, np.int32)
+        m = 0
+        for i in range(1, n):
+            d = evals_i32[i] - evals_i32[i - 1]
+            deltas[i] = d
+            if abs(d) >= threshold:
+                idx[m] = i + 1
+                spk[m] = d
+                m += 1
+        return deltas, idx[:m], spk[:m]
+
+else:
+    _spikes_nb = None
+
+# JIT パスを使う最小系列長。短い対局では呼び出しオーバーヘッドが勝る。
+_NB_MIN_LEN = 1024
+
+# USI info 行の score 抽出。`.*?` は長い info 行でバックトラックし得るので、
+# 呼び出し側で `"score " in line` の literal プリフィルタを通った行にのみ適用する。
+# USI ログは純 ASCII なので re.ASCII で \b/\d/\s の Unicode 表引きを省く。
+INFO_RE = re.compile(r"\binfo\b.*?\bscore\s+(cp|mate)\s+(-?\d+)", re.ASCII)
+BESTMOVE_RE = re.compile(r"\bbestmove\s+(\S+)", re.ASCII)
+
+# mmap した bytes バッファを 1 回の finditer で走査するための結合パターン。
+# `[^\n]*?` で行内に閉じ、per-line の str 生成と UTF-8 decode を不要にする。
+LOG_SCAN_RE = re.compile(
+    rb"(?P<info>\binfo\b[^\n]*?\bscore\s+(?P<kind>cp|mate)\s+(?P<val>-?\d+))"
+    rb"|(?P<bm>\bbestmove\s+(?P<mv>\S+))"
+)
+
+# mate スコアは cp 換算でこの値に飽和させる（符号は mate 手数の符号に従う）。
+MATE_CP = 100000
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_filter(pattern):
+    """include/exclude 用の正規表現をパターン文字列キーでキャッシュする。"""
+    return re.compile(pattern)
+
+
+def parse_log(path, include=None, exclude=None):
+    """ログ 1 ファイルから (moves, evals) を復元する。
+
+    evals[i] は i+1 手目の bestmove 直前に出力された最後の score。
+    mate スコアは ±MATE_CP に飽和させる。
+
+    include/exclude 未指定時（通常運用）は mmap + bytes 正規表現の
+    zero-copy 一括走査。行単位フィルタが必要なときのみ行イテレーションに
+    フォールバックする。
+    """
+    if include is None and exclude is None:
+        return _parse_log_mmap(path)
+    return _parse_log_lines(path, include, exclude)
+
+
+def _parse_log_mmap(path):
+    """mmap したバッファを LOG_SCAN_RE の finditer 1 回で走査する高速パス。"""
+    moves = []
+    # boxed int の list（28 byte/要素 + ポインタ）でなく 4 byte 連続格納。
+    evals = array.array("i")
+    last_score = None
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # 空ファイルや mmap 不可の fs
+            buf = f.read()
+        for m in LOG_SCAN_RE.finditer(buf):
+            if m.group("info") is not None:
+                val = int(m.group("val"))
+                if m.group("kind") == b"mate":
+                    last_score = MATE_CP if val > 0 else -MATE_CP
+                else:
+                    last_score = val
+            elif last_score is not None:
+                moves.append(m.group("mv").decode("ascii"))
+                evals.append(last_score)
+                last_score = None
+    return moves, evals
+
+
+def _parse_log_lines(path, include=None, exclude=None):
+    """include/exclude の行フィルタを伴う従来の行単位パス。"""
+    include_re = _compile_filter(include) if include else None
+    exclude_re = _compile_filter(exclude) if exclude else None
+    moves = []
+    evals = array.array("i")
+    last_score = None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if include_re and not include_re.search(line):
+                continue
+            if exclude_re and exclude_re.search(line):
+                continue
+            # literal 検査で正規表現の走査を避ける: USI ログの 9 割超は
+            # score を含まない info 行・GUI コマンドであり、`in` は
+            # regex の NFA より桁違いに安い。
+            if "score " in line:
+                m = INFO_RE.search(line)
+                if m:
+                    kind, val = m.group(1), int(m.group(2))
+                    if kind == "mate":
+                        last_score = MATE_CP if val > 0 else -MATE_CP
+                    else:
+                        last_score = val
+            elif "bestmove " in line:
+                m = BESTMOVE_RE.search(line)
+                if m and last_score is not None:
+                    moves.append(m.group(1))
+                    evals.append(last_score)
+                    last_score = None
+    return moves, evals
+
+
+def _as_i32(evals):
+    """評価値列を int32 ndarray 化する。array.array('i') は buffer protocol
+    経由の zero-copy（np.frombuffer）、list 等は従来どおり変換コピー。"""
+    if isinstance(evals, array.array):
+        return np.frombuffer(evals, dtype=np.int32)
+    return np.asarray(evals, dtype=np.int32)
+
+
+def compute_deltas_and_spikes(evals, threshold, topk=None):
+    """全手の delta 列とスパイク (ply, delta) 列を 1 本の差分計算から導出する。
+
+    evals.csv の delta 列とスパイク判定が同じ diff を別々に計算していたのを
+    融合し、評価値列の走査を 1 回にする（演算は同じ、メモリトラフィック半分）。
+    ply は 1 始まり。先頭手は前手が無いため対象外（最小 ply は 2）、
+    deltas[0] は 0。topk 指定時は |delta| の大きい順に上位 topk 件へ絞る。
+    """
+    if _spikes_nb is not None and len(evals) > _NB_MIN_LEN:
+        # 非常に長い系列は diff・delta 列生成・閾値判定を融合した JIT で 1 パス。
+        deltas_arr, plys, spk = _spikes_nb(_as_i32(evals), threshold)
+        if topk is not None and plys.size > topk:
+            sel = np.sort(np.argsort(-np.abs(spk), kind="stable")[:topk])
+            plys, spk = plys[sel], spk[sel]
+        return deltas_arr.tolist(), list(zip(plys.tolist(), spk.tolist()))
+    if np is not None:
+        # diff は 1 回だけ取り、CSV 用 delta 列とスパイク抽出の両方に使う。
+        # topk の選択は閾値通過後の小さい列に対する安定 argsort で行う
+        # （argpartition は |delta| 同値が境界にかかると任意選択になり、
+        # 純 Python fallback の「同値は ply 昇順優先」と食い違う）。
+        d = np.diff(_as_i32(evals))
+        idx = np.flatnonzero(np.abs(d) >= threshold)
+        if topk is not None and idx.size > topk:
+            sel = np.argsort(-np.abs(d[idx]), kind="stable")[:topk]
+            idx = np.sort(idx[sel])
+        deltas = [0]
+        deltas.extend(d.tolist())
+        return deltas, list(zip((idx + 2).tolist(), d[idx].tolist()))
+    deltas = [0]
+    spikes = []
+    prev = None
+    for i, sc in enumerate(evals):
+        if prev is not None:
+            d = sc - prev
+            deltas.append(d)
+            if abs(d) >= threshold:
+                spikes.append((i + 1, d))
+        prev = sc
+    if topk is not None and len(spikes) > topk:
+        spikes = sorted(spikes, key=lambda x: abs(x[1]), reverse=True)[:topk]
+        spikes.sort(key=lambda x: x[0])
+    return deltas, spikes
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("log", help="USI 対局ログ")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument("--threshold", type=int, default=300, help="スパイク判定の cp 差分閾値")
+    ap.add_argument("--topk", type=int, default=None, help="|delta| 上位 K 件に絞る")
+    ap.add_argument("--include", default=None, help="この正規表現に一致する行のみ対象")
+    ap.add_argument("--exclude", default=None, help="この正規表現に一致する行を除外")
+    args = ap.parse_args(argv)
+
+    moves, evals = parse_log(args.log, args.include, args.exclude)
+    if not evals:
+        print(f"no eval lines found in {args.log}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.out, exist_ok=True)
+    # delta 列とスパイク判定を 1 本の差分計算で済ませる。
+    deltas, spikes = compute_deltas_and_spikes(evals, args.threshold, args.topk)
+    # 行ごとの f.write は Python レベルの I/O 呼び出しを N 回払う。
+    # 全行をリストに組み立てて writelines 1 回（C レベル）で書く。
+    evals_csv = os.path.join(args.out, "evals.csv")
+    with open(evals_csv, "w", encoding="utf-8", buffering=1 << 20) as f:
+        rows = [
+            f"{i},{mv},{sc},{d}\n"
+            for i, (mv, sc, d) in enumerate(zip(moves, evals, deltas), start=1)
+        ]
+        f.write("ply,move,eval_cp,delta\n")
+        f.writelines(rows)
+
+    spikes_csv = os.path.join(args.out, "spikes.csv")
+    with open(spikes_csv, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write("ply,move,eval_cp,delta\n")
+        f.writelines(
+            f"{ply},{moves[ply - 1]},{evals[ply - 1]},{delta}\n" for ply, delta in spikes
+        )
+
+    print(f"{len(evals)} plies, {len(spikes)} spikes -> {spikes_csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
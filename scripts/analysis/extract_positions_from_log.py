@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""対局ログから特定の着手番号（評価値ドロップ地点）の局面を抜き出す。
+
+過去の解析で評価値ドロップが観測された手番号（既定: 21, 28, 32, 33, 35）の
+`position ...` 行を切り出し、`targets.json` 形式で出力する。手番号は
+`--plies` で上書きできる。
+
+`parse_bestmoves` は単一の forward パスで `last_cp` / `last_depth` を維持し、
+bestmove に対応する直後の position 行は事前計算した行番号リストへの
+bisect で O(log N) で引く（bestmove ごとにログを遡る O(N^2) 走査をしない）。
+"""
+
+import argparse
+import bisect
+import os
+import re
+import sys
+
+from _common import dump_targets
+
+# USI ログは純 ASCII なので re.ASCII で \b/\d/\s の Unicode 表引きを省く。
+_INFO_CP_DEPTH_RE = re.compile(r"info\s+depth\s+(\d+).*?score cp\s+([+-]?\d+)", re.ASCII)
+BESTMOVE_RE = re.compile(r"\bbestmove\s+(\S+)", re.ASCII)
+POS_LINE_RE = re.compile(r"\bposition\s+(?:startpos|sfen)\S*.*", re.ASCII)
+
+# bestmove 行から対応する position 行までに許容する最大行数。
+POS_LOOKAHEAD = 80
+
+# 既定で抜き出す手番号（過去の解析で評価値ドロップが観測された地点）。
+_DROP_INDICES: tuple[int, ...] = (21, 28, 32, 33, 35)
+
+
+def parse_bestmoves(lines):
+    """手ごとの (bestmove, last_cp, last_depth, pos_after) を単一パスで復元する。"""
+    # position 行の行番号を 1 回だけ前計算し、bestmove ごとの前方探索を
+    # bisect に置き換える。
+    pos_indices = []
+    for i, line in enumerate(lines):
+        if "position " in line and POS_LINE_RE.search(line):
+            pos_indices.append(i)
+
+    best = []
+    last_cp = None
+    last_depth = None
+    for i, line in enumerate(lines):
+        # literal 検査（memchr 系の SIMD 検索）で大半の行を ~ns で棄却し、
+        # 正規表現はマッチし得る行にのみ適用する。
+        if "score cp" in line:
+            m = _INFO_CP_DEPTH_RE.search(line)
+            if m:
+                last_depth = int(m.group(1))
+                last_cp = int(m.group(2))
+            continue
+        if "bestmove " not in line:
+            continue
+        bm = BESTMOVE_RE.search(line)
+        if bm:
+            pos_after = None
+            j = bisect.bisect_right(pos_indices, i)
+            if j < len(pos_indices) and pos_indices[j] - i <= POS_LOOKAHEAD:
+                pm = POS_LINE_RE.search(lines[pos_indices[j]])
+                pos_after = pm.group(0).strip() if pm else None
+            best.append((bm.group(1), last_cp, last_depth, pos_after))
+            last_cp = None
+            last_depth = None
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("log", help="USI 対局ログ")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument(
+        "--plies",
+        type=int,
+        nargs="*",
+        default=None,
+        help="抜き出す手番号（省略時は既定のドロップ地点）",
+    )
+    args = ap.parse_args(argv)
+
+    drop_indices = sorted(set(args.plies)) if args.plies else _DROP_INDICES
+
+    with open(args.log, "r", encoding="utf-8", errors="ignore") as f:
+        lines = f.readlines()
+    best = parse_bestmoves(lines)
+
+    base = os.path.basename(args.log)
+    stem = os.path.splitext(base)[0]
+    targets = []
+    for ply in drop_indices:
+        di = ply - 1
+        if di >= len(best):
+            continue
+        _mv, cp, depth, pos_after = best[di]
+        if pos_after is None:
+            continue
+        targets.append(
+            {
+                "tag": f"{stem}_ply{ply}",
+                "position": pos_after,
+                "origin": base,
+                "origin_ply": ply,
+                "eval_cp": cp,
+                "depth": depth,
+            }
+        )
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, "targets.json")
+    dump_targets(targets, out_path)
+    print(f"{len(targets)} targets -> {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
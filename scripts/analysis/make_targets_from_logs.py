@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""複数の USI 対局ログからスパイク局面を抽出し `targets.json` を生成する。
+
+各ログについて bestmove ごとの最終評価値列を復元し、評価値差分が閾値を
+超えた手（スパイク）の直前 `back_min..back_max` 手を `position` 文字列として
+切り出して回帰ターゲット化する。出力は `run_eval_targets.py` が読む
+`{"targets": [...]}` 形式。
+
+使用例:
+    python3 scripts/analysis/make_targets_from_logs.py logs/*.log \
+        --out targets/ --threshold 300 --back-min 1 --back-max 4
+"""
+
+import argparse
+import array
+import functools
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+
+from _common import JsonArrayWriter, chops, compute_spikes
+
+# score / bestmove / position を名前付き択一にまとめた結合パターン。
+# ファイル全体を finditer 1 回で走査し、行単位の複数 search を排除する。
+# depth は optional（multipv 等で欠ける行があるため）。`[^\n]` で行内に閉じる。
+LINE_RE = re.compile(
+    r"(?P<score>\binfo\b(?:[^\n]*?\bdepth\s+(?P<depth>\d+))?[^\n]*?"
+    r"\bscore\s+(?P<kind>cp|mate)\s+(?P<val>-?\d+))"
+    r"|(?P<bm>\bbestmove\s+(?P<mv>\S+))"
+    r"|(?P<pos>\bposition\s+(?:startpos|sfen)[^\n]*)",
+    re.ASCII,  # USI ログは純 ASCII: \b/\d/\s の Unicode 表引きを省く
+)
+
+MATE_CP = 100000
+
+
+def parse_bestmoves_with_positions(text):
+    """ログ全文から手ごとの (bestmove, last_cp, last_depth, pos_after) を復元する。
+
+    pos_after はその bestmove を指した後に GUI から送られた `position ...` 行
+    （= スパイク局面の moves 列を含む）。見つからない場合は None。
+
+    行に分割せず、LINE_RE の finditer 1 回でマッチ列として走査する。
+    bestmove の直後に現れた最初の position マッチを pos_after として対応付ける
+    （旧実装の行数制限付き前方探索と同じ対応関係になる）。
+    """
+    best = []
+    last_cp = None
+    last_depth = None
+    pending = None  # pos_after 待ちの (mv, cp, depth)
+    for m in LINE_RE.finditer(text):
+        if m.group("score") is not None:
+            if m.group("depth") is not None:
+                last_depth = int(m.group("depth"))
+            val = int(m.group("val"))
+            if m.group("kind") == "mate":
+                last_cp = MATE_CP if val > 0 else -MATE_CP
+            else:
+                last_cp = val
+        elif m.group("bm") is not None:
+            if pending is not None:
+                best.append((*pending, None))
+            pending = (m.group("mv"), last_cp, last_depth)
+            last_cp = None
+            last_depth = None
+        elif pending is not None:
+            best.append((*pending, m.group("pos").strip()))
+            pending = None
+    if pending is not None:
+        best.append((*pending, None))
+    return best
+
+
+def _process_one(path, threshold, topk, back_min, back_max):
+    """ログ 1 ファイルの抽出（重複排除前）。process pool の worker としても呼ばれる。"""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+    best = parse_bestmoves_with_positions(text)
+    # evals は cp 欠き手（定跡手・resign 等）を除いた列なので、ply / pos_after
+    # を同じ添字で引けるよう並列配列へ同時に append する
+    # （make_targets_from_moves と同じ構え）。best[idx] を直接引くと
+    # cp 欠き手の件数分だけスパイク位置がずれる。
+    # boxed int の list でなく 4 byte 連続格納（下流の diff は zero-copy）。
+    evals = array.array("i")
+    ply_arr = []
+    pos_arr = []
+    for i, (_mv, cp, _d, pos_line) in enumerate(best, 1):
+        if cp is None:
+            continue
+        evals.append(cp)
+        ply_arr.append(i)
+        pos_arr.append(pos_line)
+    spikes = compute_spikes(evals, threshold, topk)
+    # path 分解はファイルごとに 1 回（スパイク x back ループ内で再計算しない）。
+    base = os.path.basename(path)
+    stem = os.path.splitext(base)[0]
+    cands = []
+    for idx, delta in spikes:
+        pos_line = pos_arr[idx - 1]
+        if pos_line is None:
+            continue
+        ply = ply_arr[idx - 1]
+        for k, pos in chops(pos_line, range(back_min, back_max + 1)).items():
+            cands.append(
+                {
+                    "tag": f"{stem}_ply{ply}_back{k}",
+                    "position": pos,
+                    "origin": base,
+                    "origin_ply": ply,
+                    "back": k,
+                    "delta": delta,
+                }
+            )
+    return cands, f"{path}: {len(evals)} plies, {len(spikes)} spikes"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("logs", nargs="+", help="USI 対局ログ（複数可）")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument("--threshold", type=int, default=300, help="スパイク判定の cp 差分閾値")
+    ap.add_argument("--topk", type=int, default=None, help="ログごとに |delta| 上位 K 件へ絞る")
+    ap.add_argument("--back-min", type=int, default=1, help="スパイク手から遡る最小手数")
+    ap.add_argument("--back-max", type=int, default=4, help="スパイク手から遡る最大手数")
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="ログ単位の並列パース数（1 で逐次実行）",
+    )
+    args = ap.parse_args(argv)
+
+    worker = functools.partial(
+        _process_one,
+        threshold=args.threshold,
+        topk=args.topk,
+        back_min=args.back_min,
+        back_max=args.back_max,
+    )
+    # ログ単位で独立な regex 重めの CPU 仕事なので process pool で GIL を回避。
+    # ex.map は入力順を保つため、重複排除を含め出力は逐次実行と一致する。
+    # list() で全ログ分の候補を実体化せず、ログ 1 件分を書いては捨てる
+    # （JsonArrayWriter の逐次書きと合わせてピークメモリを総件数に非依存に）。
+    def _results():
+        if args.jobs > 1 and len(args.logs) > 1:
+            with ProcessPoolExecutor(max_workers=min(args.jobs, len(args.logs))) as ex:
+                yield from ex.map(worker, args.logs, chunksize=1)
+        else:
+            for p in args.logs:
+                yield worker(p)
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, "targets.json")
+    # 局面文字列は数百トークンに達するため、そのまま set に入れると
+    # メモリとハッシュ計算の両方が moves 列長に比例して膨らむ。
+    # 16 byte の blake2b ダイジェストをキーにして O(1)/entry に抑える。
+    uniq_hashes = set()
+    with JsonArrayWriter(out_path) as w:
+        for cands, summary in _results():
+            for t in cands:
+                h = blake2b(t["position"].encode("ascii"), digest_size=16).digest()
+                if h in uniq_hashes:
+                    continue
+                uniq_hashes.add(h)
+                w.write(t)
+            print(summary)
+        n = w.count
+    print(f"{n} targets -> {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""`moves.jsonl`（Rust 側ツールの手単位レコード）から `targets.json` を生成する。
+
+selfplay / 教師生成ツールが出力する 1 行 1 手の JSONL
+（`game` / `game_idx` / `ply` / `move` / `eval_cp` / `eval_mate` / `position`）
+を対局単位にグループ化し、評価値差分が閾値を超えた手の直前
+`back_min..back_max` 手を回帰ターゲット化する。
+
+使用例:
+    python3 scripts/analysis/make_targets_from_moves.py moves.jsonl \
+        --out targets/ --threshold 300
+"""
+
+import argparse
+import array
+import functools
+import json
+import operator
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+
+from _common import JsonArrayWriter, chops, compute_spikes
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # orjson なし環境では stdlib json へフォールバック
+    orjson = None
+    _loads = json.loads
+
+MATE_CP = 100000
+
+
+def _process_one(path, threshold, topk, back_min, back_max):
+    """moves.jsonl 1 ファイルの抽出（重複排除前）。process pool の worker としても呼ばれる。"""
+    by_group = {}
+    # binary mode で開き text decode を省く（orjson / stdlib json とも bytes を受ける）。
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = _loads(line)
+            key = (str(rec.get("game", "")), int(rec.get("game_idx", 0)))
+            by_group.setdefault(key, []).append(rec)
+
+    # path 分解はファイルごとに 1 回（スパイク x back ループ内で再計算しない）。
+    base = os.path.basename(path)
+    stem = os.path.splitext(base)[0]
+    cands = []
+    # キー自体が (str, int) タプルなので lambda でのタプル再構築は不要。
+    # itemgetter は C 実装で、比較ごとの Python フレーム生成を省く。
+    for (game, gidx), recs in sorted(by_group.items(), key=operator.itemgetter(0)):
+        # 比較のたびに int() を払わないよう ply を 1 回だけ前計算する。
+        for r in recs:
+            r["_ply_i"] = int(r.get("ply", 0))
+        recs_sorted = sorted(recs, key=operator.itemgetter("_ply_i"))
+        # per-ply メタは dict の AoS でなく並列リストの SoA で持つ。
+        # dict は 1 entry ~232 byte + ハッシュ表で、長い対局ではメモリと
+        # キャッシュミスの主因になる。下流はリスト index 参照のみ。
+        # boxed int の list でなく 4 byte 連続格納（下流の diff は zero-copy）。
+        evals = array.array("i")
+        ply_abs_arr = []
+        pos_body_arr = []
+        # bound method を局所名に束縛して LOAD_ATTR をループ外へ追い出す。
+        evals_append = evals.append
+        ply_append = ply_abs_arr.append
+        pos_append = pos_body_arr.append
+        for rec in recs_sorted:
+            # スキーマは Rust 側ツールが保証する（eval_cp / eval_mate は
+            # int か null）ので isinstance 判定は払い、None チェックのみ。
+            cp = rec.get("eval_cp")
+            if cp is None:
+                mate = rec.get("eval_mate")
+                if mate is None:
+                    continue
+                cp = MATE_CP if mate > 0 else -MATE_CP
+            evals_append(cp)
+            ply_append(rec["_ply_i"])
+            pos_append(rec.get("position"))
+
+        spikes = compute_spikes(evals, threshold, topk)
+        for idx, delta in spikes:
+            pos_line = pos_body_arr[idx - 1]
+            if not pos_line:
+                continue
+            ply_abs = ply_abs_arr[idx - 1]
+            for k, pos in chops(pos_line, range(back_min, back_max + 1)).items():
+                cands.append(
+                    {
+                        "tag": f"{stem}_g{gidx}_ply{ply_abs}_back{k}",
+                        "position": pos,
+                        "origin": base,
+                        "origin_game": game,
+                        "origin_ply": ply_abs,
+                        "back": k,
+                        "delta": delta,
+                    }
+                )
+    return cands, f"{path}: {len(by_group)} games"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("moves", nargs="+", help="moves.jsonl（複数可）")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument("--threshold", type=int, default=300, help="スパイク判定の cp 差分閾値")
+    ap.add_argument("--topk", type=int, default=None, help="対局ごとに |delta| 上位 K 件へ絞る")
+    ap.add_argument("--back-min", type=int, default=1, help="スパイク手から遡る最小手数")
+    ap.add_argument("--back-max", type=int, default=4, help="スパイク手から遡る最大手数")
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="ファイル単位の並列パース数（1 で逐次実行）",
+    )
+    args = ap.parse_args(argv)
+
+    worker = functools.partial(
+        _process_one,
+        threshold=args.threshold,
+        topk=args.topk,
+        back_min=args.back_min,
+        back_max=args.back_max,
+    )
+    # ファイル単位で独立な CPU 仕事なので process pool で GIL を回避。
+    # ex.map は入力順を保つため、重複排除を含め出力は逐次実行と一致する。
+    # list() で全ファイル分の候補を実体化せず、1 ファイル分を書いては捨てる
+    # （JsonArrayWriter の逐次書きと合わせてピークメモリを総件数に非依存に）。
+    def _results():
+        if args.jobs > 1 and len(args.moves) > 1:
+            with ProcessPoolExecutor(max_workers=min(args.jobs, len(args.moves))) as ex:
+                yield from ex.map(worker, args.moves, chunksize=1)
+        else:
+            for p in args.moves:
+                yield worker(p)
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, "targets.json")
+    # 局面文字列は数百トークンに達するため、そのまま set に入れると
+    # メモリとハッシュ計算の両方が moves 列長に比例して膨らむ。
+    # 16 byte の blake2b ダイジェストをキーにして O(1)/entry に抑える。
+    uniq_hashes = set()
+    with JsonArrayWriter(out_path) as w:
+        for cands, summary in _results():
+            for t in cands:
+                h = blake2b(t["position"].encode("ascii"), digest_size=16).digest()
+                if h in uniq_hashes:
+                    continue
+                uniq_hashes.add(h)
+                w.write(t)
+            print(summary)
+        n = w.count
+    print(f"{n} targets -> {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
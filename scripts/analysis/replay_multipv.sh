@@ -0,0 +1,63 @@
+#!/bin/bash
+# 一連の局面 prefix をエンジンで再生し、prefix ごとの bestmove / last_info を
+# summary に書き出す。run_regression_checks.py から呼ばれる。
+#
+# 旧実装は固定 sleep 後に quit しており bestmove を待っていなかったため、
+# isready が遅い（NNUE ロード等）エンジンで bestmove が欠けて回帰ガードが
+# 偽陽性 FAIL になった。coproc の read ループで usiok / readyok / bestmove
+# をそれぞれ待つ（bestmove は byoyomi + 30s 上限）。
+#
+# usage: replay_multipv.sh <summary_out> <byoyomi_ms> <position...>
+#   ENGINE_BIN: エンジンバイナリ（既定: target/release/engine-usi）
+set -euo pipefail
+
+summary_out="$1"
+byoyomi_ms="$2"
+shift 2
+
+engine="${ENGINE_BIN:-target/release/engine-usi}"
+
+: > "$summary_out"
+
+go_timeout=$(( byoyomi_ms / 1000 + 30 ))
+
+idx=0
+for pos in "$@"; do
+    idx=$((idx + 1))
+    coproc ENG { "$engine"; }
+
+    echo "usi" >&"${ENG[1]}"
+    while IFS= read -r -t 10 line <&"${ENG[0]}"; do
+        [[ "$line" == usiok* ]] && break
+    done
+    echo "isready" >&"${ENG[1]}"
+    while IFS= read -r -t 60 line <&"${ENG[0]}"; do
+        [[ "$line" == readyok* ]] && break
+    done
+
+    {
+        echo "usinewgame"
+        echo "$pos"
+        echo "go byoyomi $byoyomi_ms"
+    } >&"${ENG[1]}"
+
+    bestmove=""
+    last_info=""
+    while IFS= read -r -t "$go_timeout" line <&"${ENG[0]}"; do
+        case "$line" in
+            bestmove\ *)
+                bestmove=$(printf '%s\n' "$line" | awk '{print $2}')
+                break
+                ;;
+            *score*)
+                last_info="$line"
+                ;;
+        esac
+    done
+
+    echo "quit" >&"${ENG[1]}" 2>/dev/null || true
+    wait "$ENG_PID" 2>/dev/null || true
+
+    echo "pre-${idx}: bestmove=${bestmove}" >> "$summary_out"
+    echo "pre-${idx}: last_info=${last_info}" >> "$summary_out"
+done
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""`targets.json` の各局面を複数プロファイルで評価して `summary.json` を書く。
+
+make_targets 系スクリプトが出力した `{"targets": [...]}` を読み、
+プロファイル（base / rootfull / gates）ごとにエンジンを起動して
+`go byoyomi` の最終評価値 (cp, depth) を収集する。プロファイル間の
+評価値乖離から探索ゲート起因のスパイクを切り分けるのが目的。
+
+エンジン操作・並列化・resume の実体は `_usi_sweep.run_sweep` にあり、
+このスクリプトはプロファイル定義と CLI だけを持つ。
+
+エンジンバイナリは環境変数 `ENGINE_BIN` で指定する。
+
+使用例:
+    ENGINE_BIN=target/release/engine-usi \\
+        python3 scripts/analysis/run_eval_targets.py targets/targets.json \\
+        --out sweep/ --byoyomi 2000 --jobs 4
+"""
+
+import argparse
+import json
+import sys
+
+from _usi_sweep import run_sweep
+
+# (name, 追加 setoption, 追加環境変数)。envadd はプロセス起動時にしか
+# 反映できないため setoption と別枠で持つ。
+PROFILES = [
+    ("base", {}, {}),
+    ("rootfull", {"RootFullSearch": "true"}, {}),
+    ("gates", {}, {"LS_DISABLE_GATES": "1"}),
+]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("targets", help="targets.json")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument("--byoyomi", type=int, default=2000, help="go byoyomi (ms)")
+    ap.add_argument("--threads", type=int, default=1, help="エンジンの Threads")
+    ap.add_argument("--minthink", type=int, default=0, help="MinimumThinkingTime (ms)")
+    ap.add_argument(
+        "--hash",
+        type=int,
+        default=None,
+        help="USI_Hash (MiB)。省略時は 256、並列時は RAM/2/jobs に自動縮小",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="summary.jsonl の完了済み (tag, profile) をスキップして再開する",
+    )
+    ap.add_argument(
+        "--fresh-tt",
+        action="store_true",
+        help="局面ごとに usinewgame を送って TT をクリアする（既定は持ち越し）",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="並列エンジン数（既定: cpu 数 // threads）",
+    )
+    args = ap.parse_args(argv)
+
+    with open(args.targets, "r", encoding="utf-8") as f:
+        targets = json.load(f)["targets"]
+
+    run_sweep(
+        targets,
+        PROFILES,
+        args.out,
+        byoyomi_ms=args.byoyomi,
+        threads=args.threads,
+        minthink=args.minthink,
+        hash_arg=args.hash,
+        jobs=args.jobs,
+        fresh_tt=args.fresh_tt,
+        resume=args.resume,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
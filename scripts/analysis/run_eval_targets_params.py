@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""`targets.json` の各局面を任意の setoption パラメータセットで評価する。
+
+`run_eval_targets.py` の固定プロファイルの代わりに、`--params-json` で
+渡した setoption 辞書 1 セットを全ターゲットに適用する。探索パラメータの
+単発トライアル（SPSA の候補検証など）向け。
+
+エンジン操作・並列化・resume の実体は `_usi_sweep.run_sweep` にあり、
+このスクリプトはトライアル定義と CLI だけを持つ。summary は
+`summary_<name>.json(l)` に書かれる。
+
+使用例:
+    ENGINE_BIN=target/release/engine-usi \\
+        python3 scripts/analysis/run_eval_targets_params.py targets/targets.json \\
+        --params-json '{"RootFullSearch": "true"}' --name trial1 --out sweep/
+"""
+
+import argparse
+import json
+import sys
+
+from _usi_sweep import run_sweep
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("targets", help="targets.json")
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument("--params-json", default="{}", help="setoption 辞書 (JSON)")
+    ap.add_argument("--env-json", default="{}", help="追加環境変数の辞書 (JSON)")
+    ap.add_argument("--name", default="params", help="トライアル名（ログ/summary の識別子）")
+    ap.add_argument("--byoyomi", type=int, default=2000, help="go byoyomi (ms)")
+    ap.add_argument("--threads", type=int, default=1, help="エンジンの Threads")
+    ap.add_argument("--minthink", type=int, default=0, help="MinimumThinkingTime (ms)")
+    ap.add_argument(
+        "--hash",
+        type=int,
+        default=None,
+        help="USI_Hash (MiB)。省略時は 256、並列時は RAM/2/jobs に自動縮小",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="summary_<name>.jsonl の完了済み tag をスキップして再開する",
+    )
+    ap.add_argument(
+        "--fresh-tt",
+        action="store_true",
+        help="局面ごとに usinewgame を送って TT をクリアする（既定は持ち越し）",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="並列エンジン数（既定: cpu 数 // threads）",
+    )
+    ap.add_argument(
+        "--quiet",
+        action="store_true",
+        help="run ごとの進捗行を出さない（spsa_optimize 等の in-process 呼び出し用）",
+    )
+    args = ap.parse_args(argv)
+
+    params = json.loads(args.params_json)
+    envadd = json.loads(args.env_json)
+    with open(args.targets, "r", encoding="utf-8") as f:
+        targets = json.load(f)["targets"]
+
+    run_sweep(
+        targets,
+        [(args.name, params, envadd)],
+        args.out,
+        byoyomi_ms=args.byoyomi,
+        threads=args.threads,
+        minthink=args.minthink,
+        hash_arg=args.hash,
+        jobs=args.jobs,
+        fresh_tt=args.fresh_tt,
+        resume=args.resume,
+        summary_basename=f"summary_{args.name}",
+        verbose=not args.quiet,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
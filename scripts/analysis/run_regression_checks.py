@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""既知局面の評価値・bestmove が許容範囲に収まるかの回帰チェック。
+
+TOML 設定の各シナリオ（局面 prefix 列 + ガード条件）を
+`replay_multipv.sh` で再生し、prefix ごとの bestmove / 最終 info を
+ガード（cp 上下限・期待 bestmove）と突き合わせる。探索変更で既知の
+スパイク局面が再発していないかを selfplay より短時間で検知するのが目的。
+
+設定例 (regression_checks.toml):
+    [[scenario]]
+    name = "case12013_midgame"
+    byoyomi_ms = 1000
+    prefixes = [
+        "position startpos moves 7g7f 3c3d",
+        "position startpos moves 7g7f 3c3d 2g2f",
+    ]
+    [[scenario.guard]]
+    prefix = 1
+    min_cp = -150
+    max_cp = 300
+    bestmove = "2g2f"
+
+使用例:
+    ENGINE_BIN=target/release/engine-usi \\
+        python3 scripts/analysis/run_regression_checks.py \\
+        --config scripts/analysis/regression_checks.toml --out regress/
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # tomllib は 3.11+。3.10 では tomli を使う
+    import tomli as tomllib
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from _usi_sweep import UsiEngine, build_common
+
+# bestmove 行と last_info 行を 1 つの択一パターンにまとめ、summary を
+# bytes のまま 1 回の match で振り分ける（行ごとの複数 regex + substring
+# 走査を排除）。mate は kind グループで判定し cp へ飽和させる。
+RE_LINE = re.compile(
+    rb"^pre-(?P<num>\d+): (?:bestmove=(?P<move>\S*)"
+    rb"|last_info=.*?depth (?P<depth>\d+) seldepth (?P<seldepth>\d+)"
+    rb".*?score\s+(?P<kind>cp|mate)\s+(?P<score>-?\d+))"
+)
+
+# mate スコアは cp 換算でこの値に飽和させる。
+MATE_CP = 100000
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPLAY_SH = os.path.join(_SCRIPT_DIR, "replay_multipv.sh")
+
+
+@dataclass(slots=True, frozen=True)
+class PrefixGuard:
+    """1 prefix に対する許容条件。"""
+
+    prefix: int
+    min_cp: int | None = None
+    max_cp: int | None = None
+    bestmove: str | None = None
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            prefix=int(d["prefix"]),
+            min_cp=d.get("min_cp"),
+            max_cp=d.get("max_cp"),
+            bestmove=d.get("bestmove"),
+        )
+
+
+@dataclass(slots=True)
+class PrefixResult:
+    """summary から復元した 1 prefix の実測値。"""
+
+    bestmove: str | None = None
+    depth: int = 0
+    seldepth: int = 0
+    score_cp: int | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class Scenario:
+    """再生する局面列とガード条件のまとまり。"""
+
+    name: str
+    prefixes: list[str] = field(default_factory=list)
+    guards: list[PrefixGuard] = field(default_factory=list)
+    byoyomi_ms: int = 1000
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            name=d["name"],
+            prefixes=list(d.get("prefixes", [])),
+            guards=[PrefixGuard.from_dict(g) for g in d.get("guard", [])],
+            byoyomi_ms=int(d.get("byoyomi_ms", 1000)),
+        )
+
+
+class RegressionSuite:
+    """TOML 設定のシナリオ群を実行して違反を集計する。"""
+
+    def __init__(self, config_path, scenarios=None, outdir=".", inproc=False):
+        with open(config_path, "rb") as f:
+            config = tomllib.load(f)
+        # 名前フィルタは from_dict より前に掛ける（対象外エントリの guard
+        # 構築を払わない）。seen を同じループで集め、set の再構築もしない。
+        requested = set(scenarios or ())
+        self.scenarios = []
+        seen = set()
+        for entry in config.get("scenario", []):
+            name = entry.get("name")
+            if requested and name not in requested:
+                continue
+            self.scenarios.append(Scenario.from_dict(entry))
+            seen.add(name)
+        missing = requested - seen
+        if missing:
+            raise ValueError(f"unknown scenarios: {sorted(missing)}")
+        self.outdir = outdir
+        self.inproc = inproc
+
+    def _run_replay(self, scn):
+        """replay_multipv.sh でシナリオを再生し summary パスを返す。"""
+        summary = os.path.join(self.outdir, f"{scn.name}_summary.txt")
+        subprocess.run(
+            ["bash", _REPLAY_SH, summary, str(scn.byoyomi_ms), *scn.prefixes],
+            check=True,
+        )
+        return summary
+
+    def _run_replay_inproc(self, scn):
+        """bash + replay_multipv.sh を介さず UsiEngine で直接再生する。
+
+        シナリオごとの shell 起動 + スクリプト解釈 + prefix ごとの
+        エンジン起動を省き、1 エンジンを prefix 間で使い回す。TT は
+        fresh_tt=True で prefix ごとにクリアし bash 経路と条件を揃える。
+        出力 summary の書式は replay_multipv.sh と同一。
+        """
+        summary = os.path.join(self.outdir, f"{scn.name}_summary.txt")
+        logfile = os.path.join(self.outdir, f"{scn.name}_engine.log")
+        eng = UsiEngine(build_common(1, 0, 256), {}, logfile)
+        try:
+            with open(summary, "w", encoding="utf-8") as wf:
+                for i, pos in enumerate(scn.prefixes, start=1):
+                    eng.evaluate(pos, scn.byoyomi_ms, fresh_tt=True)
+                    wf.write(f"pre-{i}: bestmove={eng.reader.last_bestmove or ''}\n")
+                    wf.write(f"pre-{i}: last_info={eng.reader.last_info or ''}\n")
+        finally:
+            eng.close()
+        return summary
+
+    def _parse_summary(self, path):
+        """summary から prefix 番号 → PrefixResult を復元する。
+
+        bytes で読み RE_LINE 1 回の match で bestmove / last_info を
+        振り分ける。^ アンカーなので strip 由来の文字列生成も不要。
+        """
+        results = {}
+        with open(path, "rb") as f:
+            for line in f:
+                m = RE_LINE.match(line)
+                if not m:
+                    continue
+                r = results.setdefault(int(m.group("num")), PrefixResult())
+                mv = m.group("move")
+                if mv is not None:
+                    r.bestmove = mv.decode("ascii") if mv else None
+                else:
+                    r.depth = int(m.group("depth"))
+                    r.seldepth = int(m.group("seldepth"))
+                    sc = int(m.group("score"))
+                    if m.group("kind") == b"mate":
+                        r.score_cp = MATE_CP if sc > 0 else -MATE_CP
+                    else:
+                        r.score_cp = sc
+        return results
+
+    def _check_bounds(self, scn, results):
+        """ガード違反のメッセージ一覧を返す（空なら合格）。"""
+        failures = []
+        for g in scn.guards:
+            r = results.get(g.prefix)
+            if r is None:
+                failures.append(f"pre-{g.prefix}: no result")
+                continue
+            if g.bestmove is not None and r.bestmove != g.bestmove:
+                failures.append(
+                    f"pre-{g.prefix}: bestmove {r.bestmove} != expected {g.bestmove}"
+                )
+            if r.score_cp is None:
+                if g.min_cp is not None or g.max_cp is not None:
+                    failures.append(f"pre-{g.prefix}: no score")
+                continue
+            if g.min_cp is not None and r.score_cp < g.min_cp:
+                failures.append(f"pre-{g.prefix}: cp {r.score_cp} < min {g.min_cp}")
+            if g.max_cp is not None and r.score_cp > g.max_cp:
+                failures.append(f"pre-{g.prefix}: cp {r.score_cp} > max {g.max_cp}")
+        return failures
+
+    def _run_scenario(self, scn):
+        """1 シナリオの実行 + 判定。(name, failures) を返す。"""
+        try:
+            summary = (
+                self._run_replay_inproc(scn) if self.inproc else self._run_replay(scn)
+            )
+            results = self._parse_summary(summary)
+            return scn.name, self._check_bounds(scn, results)
+        except Exception as e:  # replay 失敗もシナリオ失敗として集計する
+            return scn.name, [f"error: {e}"]
+
+    def run(self, parallel=1):
+        """全シナリオを実行し、違反の一覧を (name, failures) で返す。
+
+        シナリオは互いに独立（子プロセスがエンジンを抱える）ため、
+        parallel > 1 では ThreadPoolExecutor で同時実行する。wall time は
+        合計からおおよそ max(シナリオ時間) に縮む。
+        """
+        if parallel > 1 and len(self.scenarios) > 1:
+            ncpu = os.cpu_count() or 1
+            if parallel > ncpu:
+                print(
+                    f"warning: --parallel-scenarios {parallel} > cpu {ncpu}; capping",
+                    file=sys.stderr,
+                )
+                parallel = ncpu
+            with ThreadPoolExecutor(max_workers=parallel) as ex:
+                futures = {ex.submit(self._run_scenario, s): s for s in self.scenarios}
+                outcomes = [fut.result() for fut in as_completed(futures)]
+        else:
+            outcomes = [self._run_scenario(s) for s in self.scenarios]
+        # 並列時の完了順に依らず出力を決定的にする。
+        outcomes.sort(key=lambda x: x[0])
+        return outcomes
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--config", required=True, help="シナリオ定義 TOML")
+    ap.add_argument("--out", default=".", help="summary 出力ディレクトリ")
+    ap.add_argument(
+        "--scenarios", nargs="*", default=None, help="実行するシナリオ名（省略時は全件）"
+    )
+    ap.add_argument(
+        "--inproc",
+        action="store_true",
+        help="replay_multipv.sh を使わず UsiEngine で直接再生する",
+    )
+    ap.add_argument(
+        "--parallel-scenarios",
+        type=int,
+        default=1,
+        help="同時実行するシナリオ数（エンジン Threads との積がコア数を超えると警告）",
+    )
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    suite = RegressionSuite(
+        args.config, scenarios=args.scenarios, outdir=args.out, inproc=args.inproc
+    )
+    outcomes = suite.run(parallel=args.parallel_scenarios)
+
+    nfail = 0
+    for name, failures in outcomes:
+        if failures:
+            nfail += 1
+            print(f"FAIL {name}")
+            for msg in failures:
+                print(f"  {msg}")
+        else:
+            print(f"PASS {name}")
+    print(f"{len(outcomes) - nfail}/{len(outcomes)} scenarios passed")
+    return 1 if nfail else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
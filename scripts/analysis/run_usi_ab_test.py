@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""固定ドロップ手のある局面列で 2 つの option セットを A/B 比較する。
+
+各局面 prefix をエンジンに探索させ、続けてドロップ手（既定: 8e8f）を
+指した直後の局面を短時間 (`--postms`) で再評価し、ドロップ後の評価値・
+aspiration fail 回数・finalize イベント等をトライアル単位で収集する。
+option セット A（base）と B（`--b-opts` の上書き）で同じ局面・試行数を
+回し、`summary.json` で集計を突き合わせる。
+
+探索ゲートの変更が「悪手直後の評価値復元」に与える影響を selfplay より
+短時間で比較するのが目的。
+
+エンジンバイナリは環境変数 `ENGINE_BIN` で指定する。
+
+使用例:
+    ENGINE_BIN=target/release/engine-usi \\
+        python3 scripts/analysis/run_usi_ab_test.py --positions positions.json \\
+        --trials 8 --byoyomi 1000 --out ab/ --jobs 4
+"""
+
+import argparse
+import atexit
+import collections
+import functools
+import gzip
+import json
+import os
+import re
+import selectors
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:  # numpy があれば summarize の集計をベクトル化する（無ければ純 Python）
+    import numpy as np
+except ImportError:
+    np = None
+
+try:  # orjson があれば JSON 書き出しを C 実装で行う（無ければ標準 json）
+    import orjson
+
+    def _dumps_indent(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _dumps_compact(obj):
+        return orjson.dumps(obj)
+
+except ImportError:
+
+    def _dumps_indent(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def _dumps_compact(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+ENGINE = os.environ.get("ENGINE_BIN", "target/release/engine-usi")
+
+# aspiration window の fail high/low を数える（エンジンの debug info 行）。
+ASP_FAIL_RE = re.compile(r"asp_fail(?:_high|_low)?=1|lowerbound|upperbound")
+BESTMOVE_RE = re.compile(r"^bestmove (\S+)")
+SCORE_RE = re.compile(r"score (cp|mate) (-?\d+)")
+
+# info 行の key-value 抽出を 1 つの択一 regex にまとめる。項目別に 5 回
+# re.search すると 1 行あたり 5 パス走査になり、10 秒 byoyomi の数千 info
+# 行では regex が Python 時間を支配する。finditer 1 パスで lastindex により
+# 振り分ける。グループ: 1=depth 2=seldepth 3=nodes 4=nps 5,6=score。
+INFO_KV_RE = re.compile(
+    r"\b(?:depth (\d+)|seldepth (\d+)|nodes (\d+)|nps (\d+)|score (cp|mate) (-?\d+))"
+)
+
+# 局面指定なしの場合の既定 prefix（startpos 付近の短い進行）。
+DEFAULT_POSITIONS = [
+    "7g7f 3c3d",
+    "7g7f 3c3d 2g2f 8c8d",
+]
+
+
+@functools.lru_cache(maxsize=None)
+def build_option_sets(threads, warmup, set_kind):
+    """set 種別 (a/b) に応じた setoption 辞書を組み立てる。
+
+    出力は (threads, warmup, set_kind) だけで決まるためメモ化する。
+    戻り値の dict は共有されるので、変更したい呼び出し側は dict(...) で
+    コピーしてから触ること。
+    """
+    opts = {
+        "Threads": str(threads),
+        "USI_Hash": "256",
+        "MinimumThinkingTime": "0",
+    }
+    if warmup:
+        opts["SlowMover"] = "100"
+    if set_kind == "a":
+        pass  # base のまま
+    elif set_kind == "b":
+        opts["RootFullSearch"] = "true"
+    else:
+        raise ValueError(f"unknown set kind: {set_kind}")
+    return opts
+
+
+class _LineReader:
+    """bufsize=0 の bytes pipe から select 待ち + 一括 drain で行を取り出す。
+
+    text モードの readline は TextIOWrapper のロック + 行単位 read(2) を
+    払う上、エンジンが無言の間はブロックして timeout 判定を遅らせる。
+    selectors で待ち、ready 時に 64 KiB 単位で drain して改行分割する
+    （1 回の起床で複数行を取り込める）。
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._fd = stream.fileno()
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(stream, selectors.EVENT_READ)
+        self._buf = bytearray()
+        self._lines = collections.deque()
+        self._eof = False
+
+    def readline(self, timeout):
+        """1 行（改行なし str）を返す。timeout 内に届かなければ None、EOF は ""。"""
+        while not self._lines:
+            if self._eof:
+                return ""
+            if not self._sel.select(timeout):
+                return None
+            chunk = os.read(self._fd, 65536)
+            if not chunk:
+                self._eof = True
+                continue
+            self._buf.extend(chunk)
+            if b"\n" in chunk:
+                *complete, rest = self._buf.split(b"\n")
+                self._buf = bytearray(rest)
+                self._lines.extend(complete)
+        return self._lines.popleft().decode("ascii", "ignore").rstrip("\r")
+
+    def close(self):
+        self._sel.close()
+
+
+def _wait_for(reader, token, timeout):
+    """token を含む行が届くまで待つ（timeout 秒）。
+
+    残り時間をそのまま select の timeout に渡すので、エンジンが無言でも
+    CPU を使わずに眠り、期限は monotonic 時計で正確に守られる
+    （0.05 秒刻みの再 poll はしない）。
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        line = reader.readline(remaining)
+        if line is None or line == "":
+            if line == "":
+                return False  # EOF
+            continue
+        if token in line:
+            return True
+
+
+def _read_until_bestmove(reader, timeout, on_info=None, parse_score=True):
+    """bestmove まで読み、(bestmove, last_score_cp, lines) を返す。
+
+    メイン探索と 2 つの postdrop probe で同一だった読みループの共通化。
+    parse_score=True なら SCORE_RE で最後の score を拾う（mate は符号だけ
+    残して ±100000 に飽和）。on_info があれば info 行ごとに呼ぶ（メイン
+    探索のメトリクス抽出用。その場合 score は on_info 側で拾えるので
+    parse_score=False にして二重走査を避ける）。
+    """
+    lines = []
+    bestmove = None
+    last_score = None
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        line = reader.readline(remaining)
+        if line is None:
+            continue
+        if line == "":
+            break  # EOF
+        lines.append(line)
+        # 先頭 4 文字での一段 dispatch。bestmove / readyok / id 等の
+        # 非 info 行に regex・substring 走査を一切払わない。
+        tag = line[:4]
+        if tag != "info":
+            if tag == "best":
+                m = BESTMOVE_RE.match(line)
+                if m:
+                    bestmove = m.group(1)
+                    break
+            continue
+        if parse_score:
+            m = SCORE_RE.search(line)
+            if m:
+                v = int(m.group(2))
+                last_score = (
+                    v if m.group(1) == "cp" else (100000 if v > 0 else -100000)
+                )
+        if on_info is not None:
+            on_info(line)
+    return bestmove, last_score, lines
+
+
+class EngineSession:
+    """handshake 済みエンジンプロセスを複数トライアルで使い回すセッション。
+
+    トライアルごとの Popen は fork/exec + usi/isready handshake（TT 確保・
+    NNUE ロード込み）を毎回払う。USI は 1 プロセスで usinewgame / position /
+    go を繰り返せるので、(engine, opts) ごとに 1 セッションを保持する。
+    """
+
+    def __init__(self, engine, opts):
+        # bufsize=0 の bytes モードで開き、stdout は _LineReader で drain する。
+        self.proc = subprocess.Popen(
+            [engine],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        self.reader = _LineReader(self.proc.stdout)
+        self.send("usi")
+        _wait_for(self.reader, "usiok", 10.0)
+        for k, v in opts.items():
+            self.send(f"setoption name {k} value {v}")
+        self.send("isready")
+        _wait_for(self.reader, "readyok", 60.0)
+
+    def send(self, s):
+        self.proc.stdin.write((s + "\n").encode("ascii"))
+        self.proc.stdin.flush()
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        try:
+            self.proc.stdin.write(b"quit\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self.proc.wait(timeout=2.0)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.reader.close()
+
+
+# (engine, opts) → EngineSession。ProcessPoolExecutor の worker プロセス内
+# でも module global は生き続けるため、同一 worker に流れてきた同条件の
+# トライアルは handshake なしで続行できる。
+_SESSIONS = {}
+
+
+def _get_session(engine, opts):
+    key = (engine, frozenset(opts.items()))
+    sess = _SESSIONS.get(key)
+    if sess is None or not sess.alive():
+        sess = EngineSession(engine, opts)
+        _SESSIONS[key] = sess
+    return sess
+
+
+def _retire_session(engine, opts):
+    """タイムアウト等で状態不明になったセッションを破棄する。"""
+    sess = _SESSIONS.pop((engine, frozenset(opts.items())), None)
+    if sess is not None:
+        sess.close()
+
+
+def _close_all_sessions():
+    for sess in _SESSIONS.values():
+        sess.close()
+    _SESSIONS.clear()
+
+
+atexit.register(_close_all_sessions)
+
+
+def run_engine(
+    engine,
+    opts,
+    mvseq,
+    byoyomi_ms,
+    send_post,
+    post_ms,
+    drop_move,
+    timeout,
+    eval_best_reply,
+    allow_flex,
+):
+    """1 トライアル分のエンジン実行。メトリクス dict を返す。
+
+    メイン探索 → ドロップ手直後の再評価 → (任意) 相手最善応手後の
+    再評価、の最大 3 回 go を回す。allow_flex=True のときはメイン探索の
+    bestmove がドロップ手と異なっても続行し、実際の bestmove を記録する。
+    エンジンは (engine, opts) キーのセッションを使い回す。
+    """
+    sess = _get_session(engine, opts)
+    reader = sess.reader
+    send = sess.send
+    out_lines = []
+    res = {
+        "mvseq": mvseq,
+        "depth": 0,
+        "seldepth": 0,
+        "nodes": 0,
+        "nps": 0,
+        "score": None,
+        "bestmove": None,
+        "asp_fails": 0,
+        "fin_events": 0,
+        "fin_sanity_checked": 0,
+        "fin_switched": 0,
+        "post_score": None,
+        "postbest_score": None,
+        "elapsed_ms": None,
+        "ok": False,
+    }
+    t0 = time.time()
+    try:
+        send("usinewgame")
+        send(f"position startpos moves {mvseq}")
+        send(f"go byoyomi {byoyomi_ms}")
+
+        # メイン探索: info 行からメトリクスを拾い bestmove まで読む。
+        # aspiration fail / finalize イベントも info 行にしか現れないので
+        # on_info に集約する（score は INFO_KV_RE 側で拾うため parse_score
+        # は切って二重走査を避ける）。
+        def on_info(line):
+            if ASP_FAIL_RE.search(line):
+                res["asp_fails"] += 1
+            if "finalize_event" in line:
+                res["fin_events"] += 1
+                if "sanity_checked=1" in line:
+                    res["fin_sanity_checked"] += 1
+                if "switched=1" in line:
+                    res["fin_switched"] += 1
+            if line[:11] == "info depth ":
+                # 1 パスの finditer で depth/seldepth/nodes/nps/score を拾う。
+                for m in INFO_KV_RE.finditer(line):
+                    g = m.lastindex
+                    if g == 1:
+                        d = int(m.group(1))
+                        if d > res["depth"]:
+                            res["depth"] = d
+                    elif g == 2:
+                        sd = int(m.group(2))
+                        if sd > res["seldepth"]:
+                            res["seldepth"] = sd
+                    elif g == 3:
+                        res["nodes"] = int(m.group(3))
+                    elif g == 4:
+                        res["nps"] = int(m.group(4))
+                    else:
+                        v = int(m.group(6))
+                        res["score"] = (
+                            v if m.group(5) == "cp" else (100000 if v > 0 else -100000)
+                        )
+
+        bestmove, _, lines = _read_until_bestmove(
+            reader, timeout, on_info=on_info, parse_score=False
+        )
+        out_lines.extend(lines)
+        res["bestmove"] = bestmove
+
+        if res["bestmove"] is None:
+            return res
+        if res["bestmove"] != drop_move and not allow_flex:
+            res["ok"] = True  # 固定手が選ばれなかったトライアルは post なしで終了
+            return res
+
+        if send_post:
+            # ドロップ手直後の局面を短時間で再評価。
+            send(f"position startpos moves {mvseq} {drop_move}")
+            send(f"go movetime {post_ms}")
+            post_best, post_score, lines = _read_until_bestmove(
+                reader, post_ms / 1000.0 + 10.0
+            )
+            out_lines.extend(lines)
+            res["post_score"] = post_score
+
+            if eval_best_reply and post_best and post_best != "resign":
+                # 相手最善応手まで進めてもう 1 段評価する。
+                send(f"position startpos moves {mvseq} {drop_move} {post_best}")
+                send(f"go movetime {post_ms}")
+                _, postbest_score, lines = _read_until_bestmove(
+                    reader, post_ms / 1000.0 + 10.0
+                )
+                out_lines.extend(lines)
+                res["postbest_score"] = postbest_score
+
+        res["ok"] = True
+    finally:
+        # bestmove が届かなかったトライアルはエンジン状態が不明なので
+        # セッションを破棄する（正常終了時は次トライアルへ使い回す）。
+        if res["bestmove"] is None:
+            _retire_session(engine, opts)
+        # lines / elapsed_ms は finally で詰める。早期 return（bestmove
+        # 欠落 / --strict-fixed 不一致）で素通りすると、まさに診断が
+        # 欲しい失敗トライアルのログが record 側で空 truncate される。
+        res["elapsed_ms"] = int((time.time() - t0) * 1000)
+        res["lines"] = out_lines
+    return res
+
+
+def pxx(sorted_values, pct):
+    """ソート済みリストから pct パーセンタイルを取る（空なら None）。"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def _summarize_key_py(runs):
+    """1 key 分の集計（純 Python）。
+
+    項目ごとの list 内包 + statistics.mean では runs を 10 回近く歩き直す
+    ことになるため、1 パスで総和・件数・最小値を積む。保持が必要なのは
+    パーセンタイル用の elapsed だけで、それも 1 回だけソートする。
+    """
+    n_ok = 0
+    n_post = sum_post = 0
+    min_post = None
+    n_postbest = sum_postbest = 0
+    min_postmax = None
+    n_depth = sum_depth = 0
+    n_nps = sum_nps = 0
+    sum_asp = fin_chk = fin_swi = 0
+    elaps = []
+    for r in runs:
+        if r["ok"]:
+            n_ok += 1
+        p = r["post_score"]
+        if p is not None:
+            n_post += 1
+            sum_post += p
+            if min_post is None or p < min_post:
+                min_post = p
+        pb = r["postbest_score"]
+        if pb is not None:
+            n_postbest += 1
+            sum_postbest += pb
+            if p is not None:
+                pm = p if p < pb else pb
+                if min_postmax is None or pm < min_postmax:
+                    min_postmax = pm
+        if r["depth"]:
+            n_depth += 1
+            sum_depth += r["depth"]
+        if r["nps"]:
+            n_nps += 1
+            sum_nps += r["nps"]
+        sum_asp += r["asp_fails"]
+        fin_chk += r["fin_sanity_checked"]
+        fin_swi += r["fin_switched"]
+        if r["elapsed_ms"] is not None:
+            elaps.append(r["elapsed_ms"])
+    elaps.sort()
+    return {
+        "trials": len(runs),
+        "ok": n_ok,
+        "post_mean": sum_post / n_post if n_post else None,
+        "post_min": min_post,
+        "postbest_mean": sum_postbest / n_postbest if n_postbest else None,
+        "postmax_min": min_postmax,
+        "depth_mean": sum_depth / n_depth if n_depth else None,
+        "nps_mean": sum_nps / n_nps if n_nps else None,
+        "elapsed_p95": pxx(elaps, 95),
+        "elapsed_p99": pxx(elaps, 99),
+        "asp_fails_mean": sum_asp / len(runs) if runs else None,
+        "fin_sanity_checked": fin_chk,
+        "fin_switched": fin_swi,
+    }
+
+
+def _np_pxx(sorted_arr, pct):
+    """pxx と同じ添字規約でソート済み ndarray からパーセンタイルを取る。"""
+    n = sorted_arr.size
+    if n == 0:
+        return None
+    return int(sorted_arr[min(n - 1, n * pct // 100)])
+
+
+def _summarize_key_np(runs):
+    """1 key 分の集計（numpy ベクトル化）。
+
+    np.fromiter で中間 list を作らず int64 配列に落とし、mean/min/
+    パーセンタイルを C 側で計算する。--trials が大きい場合の集計を
+    桁違いに速くする。出力は純 Python 版と同じ添字規約。
+    """
+    post = np.fromiter(
+        (r["post_score"] for r in runs if r["post_score"] is not None), np.int64
+    )
+    postbest = np.fromiter(
+        (r["postbest_score"] for r in runs if r["postbest_score"] is not None), np.int64
+    )
+    postmax = np.fromiter(
+        (
+            min(r["post_score"], r["postbest_score"])
+            for r in runs
+            if r["post_score"] is not None and r["postbest_score"] is not None
+        ),
+        np.int64,
+    )
+    depth = np.fromiter((r["depth"] for r in runs if r["depth"]), np.int64)
+    nps = np.fromiter((r["nps"] for r in runs if r["nps"]), np.int64)
+    elaps = np.sort(
+        np.fromiter(
+            (r["elapsed_ms"] for r in runs if r["elapsed_ms"] is not None), np.int64
+        )
+    )
+    return {
+        "trials": len(runs),
+        "ok": sum(1 for r in runs if r["ok"]),
+        "post_mean": float(post.mean()) if post.size else None,
+        "post_min": int(post.min()) if post.size else None,
+        "postbest_mean": float(postbest.mean()) if postbest.size else None,
+        "postmax_min": int(postmax.min()) if postmax.size else None,
+        "depth_mean": float(depth.mean()) if depth.size else None,
+        "nps_mean": float(nps.mean()) if nps.size else None,
+        "elapsed_p95": _np_pxx(elaps, 95),
+        "elapsed_p99": _np_pxx(elaps, 99),
+        "asp_fails_mean": sum(r["asp_fails"] for r in runs) / len(runs) if runs else None,
+        "fin_sanity_checked": sum(r["fin_sanity_checked"] for r in runs),
+        "fin_switched": sum(r["fin_switched"] for r in runs),
+    }
+
+
+def summarize(all_results):
+    """key ごとのトライアル群を集計して dict を返す。"""
+    key_fn = _summarize_key_np if np is not None else _summarize_key_py
+    return {key: key_fn(runs) for key, runs in sorted(all_results.items())}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--positions", default=None, help="局面 prefix の JSON 配列ファイル")
+    ap.add_argument("--trials", type=int, default=4, help="局面×set あたりの試行数")
+    ap.add_argument("--byoyomi", type=int, default=1000, help="メイン探索 go byoyomi (ms)")
+    ap.add_argument("--postms", type=int, default=300, help="ドロップ後再評価 go movetime (ms)")
+    ap.add_argument("--drop-move", default="8e8f", help="固定で指すドロップ手")
+    ap.add_argument("--threads-list", default="1", help="比較する Threads 値（カンマ区切り）")
+    ap.add_argument("--sets", default="a,b", help="比較する option set 種別（カンマ区切り）")
+    ap.add_argument("--warmup", action="store_true", help="warmup 向け setoption を足す")
+    ap.add_argument(
+        "--eval-best-reply",
+        action="store_true",
+        help="ドロップ後の相手最善応手まで進めてもう 1 段評価する",
+    )
+    ap.add_argument(
+        "--strict-fixed",
+        action="store_true",
+        help="メイン探索の bestmove がドロップ手と異なるトライアルは post 評価しない",
+    )
+    ap.add_argument("--out", default=".", help="出力ディレクトリ")
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="並列トライアル数（既定: cpu 数 // threads）",
+    )
+    args = ap.parse_args(argv)
+
+    if args.positions:
+        with open(args.positions, "r", encoding="utf-8") as f:
+            positions = json.load(f)
+    else:
+        positions = DEFAULT_POSITIONS
+    os.makedirs(args.out, exist_ok=True)
+    threads_list = [int(t) for t in args.threads_list.split(",")]
+    set_kinds = args.sets.split(",")
+    timeout = args.byoyomi / 1000.0 + 30.0
+
+    # 全 (threads, set, position, trial) を独立タスクとして並列実行する。
+    # エンジンが compute-bound なので、Threads×jobs がコア数を超えない
+    # 既定値にする。
+    tasks = []
+    for th in threads_list:
+        for kind in set_kinds:
+            # opts は (th, kind) グループで共通。pos/trial ループでは再構築しない。
+            opts = build_option_sets(th, args.warmup, kind)
+            for pos_idx, mvseq in enumerate(positions):
+                key = f"th{th}_{kind}_pos{pos_idx}"
+                for i in range(args.trials):
+                    tasks.append((key, i, opts, mvseq))
+
+    max_th = max(threads_list)
+    jobs = args.jobs
+    if jobs is None:
+        jobs = max(1, (os.cpu_count() or 1) // max(1, max_th))
+
+    all_results = {}
+    gz_files = {}
+
+    def record(key, i, res):
+        log_path = os.path.join(args.out, f"{key}_trial{i}.log")
+        # 行ごとの write(2) は数千 syscall になる。join して 1 write で流す。
+        with open(log_path, "w", encoding="utf-8") as f:
+            lines = res.get("lines")
+            if lines:
+                f.write("\n".join(lines) + "\n")
+        # 生ログは .log に出し終えたので raw レコードからは落とし、完了の
+        # たびに gzip JSONL へ 1 行追記する（run 全体を pretty JSON で
+        # メモリに抱えて最後に再シリアライズしない）。
+        res.pop("lines", None)
+        gz = gz_files.get(key)
+        if gz is None:
+            gz = gzip.open(
+                os.path.join(args.out, f"{key}_raw.jsonl.gz"),
+                "wb",
+                compresslevel=1,
+            )
+            gz_files[key] = gz
+        gz.write(_dumps_compact(res) + b"\n")
+        all_results.setdefault(key, []).append(res)
+        print(f"{key} trial{i} post={res['post_score']} depth={res['depth']}")
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            futures = {
+                ex.submit(
+                    run_engine,
+                    ENGINE,
+                    opts,
+                    mvseq,
+                    args.byoyomi,
+                    True,
+                    args.postms,
+                    args.drop_move,
+                    timeout,
+                    args.eval_best_reply,
+                    not args.strict_fixed,
+                ): (key, i)
+                for (key, i, opts, mvseq) in tasks
+            }
+            for fut in as_completed(futures):
+                key, i = futures[fut]
+                record(key, i, fut.result())
+    else:
+        for key, i, opts, mvseq in tasks:
+            record(
+                key,
+                i,
+                run_engine(
+                    ENGINE,
+                    opts,
+                    mvseq,
+                    args.byoyomi,
+                    True,
+                    args.postms,
+                    args.drop_move,
+                    timeout,
+                    args.eval_best_reply,
+                    not args.strict_fixed,
+                ),
+            )
+
+    for gz in gz_files.values():
+        gz.close()
+
+    summary = summarize(all_results)
+    out_path = os.path.join(args.out, "summary.json")
+    with open(out_path, "wb") as f:
+        f.write(_dumps_indent(summary))
+    print(f"{len(summary)} keys -> {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
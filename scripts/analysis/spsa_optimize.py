@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""探索パラメータ (setoption) を SPSA で最適化する。
+
+パラメータ定義 JSON（`[{"name", "init", "min", "max", "step"}, ...]`）を
+読み、各イテレーションで ±摂動した候補 `theta_plus` / `theta_minus` を
+`run_eval_targets_params.py` で targets 一式に対して評価し、
+`summarize_drop_metrics.py` の `mean_drop`（小さいほど良い）を目的関数に
+勾配近似で theta を更新する。履歴は `spsa_history.jsonl` に追記する。
+
++側と −側の評価は独立なので、`--spsa-parallel` で同時実行できる
+（subprocess 待ちで GIL が外れるため ThreadPoolExecutor で足りる）。
+イテレーション時間はおよそ Jp+Jm+Jcur → max(Jp,Jm)+Jcur に縮む。
+
+`--dataset` の targets.json には基準評価値 `eval_cp` が必要
+（`extract_positions_from_log.py` の出力形式）。`make_targets_from_logs.py` /
+`make_targets_from_moves.py` の出力は `delta` のみで `eval_cp` を持たず、
+drop が 1 件も計算できないためそのままでは使えない。
+
+使用例:
+    ENGINE_BIN=target/release/engine-usi \\
+        python3 scripts/analysis/spsa_optimize.py --params spsa_params.json \\
+        --dataset targets/ --out spsa_work/ --iters 20 --spsa-parallel
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from run_eval_targets_params import main as _run_params
+from summarize_drop_metrics import run as _drop_metrics
+
+try:  # numpy があれば摂動・更新の算術をベクトル化する（無ければ dict ループ）
+    import numpy as np
+except ImportError:
+    np = None
+
+# SPRT（--early-stop 時）のパラメータ。bad 判定が食い違ったターゲット
+# （discordant pair）だけを符号検定の試行とみなし、H0: 両候補同等 (p=0.5)
+# vs H1: 片側が明確に悪い (p=_SPRT_P1) の尤度比を積む。α=β=0.05。
+_SPRT_A = math.log(0.95 / 0.05)
+_SPRT_P1 = 0.75
+
+
+def clamp_step(v, lo, hi, step):
+    """v を step 格子に丸めて [lo, hi] に収める。"""
+    q = round((v - lo) / step) * step + lo
+    return max(lo, min(hi, q))
+
+
+def _require_drops(m, label):
+    """drop が 0 件なら理由つきで即死させる。
+
+    mean_drop=None のまま勾配計算へ進むと `jp - jm` の TypeError で
+    文脈不明のまま落ちる。原因はほぼ targets.json に `eval_cp` が無い
+    （make_targets_from_logs / make_targets_from_moves 産の delta のみの
+    形式）か、全ターゲットの再評価失敗なので、その旨を明示する。
+    """
+    if m["n"] == 0:
+        raise SystemExit(
+            f"{label}: 有効な drop が 0 件。--dataset の targets.json に基準 eval_cp が"
+            "必要です（extract_positions_from_log.py の出力形式。"
+            "make_targets_from_* 産の delta のみの targets は使えません）"
+        )
+    return m
+
+
+def _drop_summary(drops, bad_th, early_stopped):
+    bad = sum(1 for d in drops if d >= bad_th)
+    n = len(drops)
+    return {
+        "n": n,
+        "mean_drop": sum(drops) / n if n else None,
+        "max_drop": max(drops) if drops else None,
+        "bad": bad,
+        "bad_rate": bad / n if n else None,
+        "early_stopped": early_stopped,
+    }
+
+
+def eval_pair_early_stop(theta_plus, theta_minus, it, args, env_seed):
+    """± 両候補をターゲット単位で並走させ、SPRT で優劣確定なら打ち切る。
+
+    どちらかが明確に悪い場合、全ターゲットを回すのは無駄が大きい。
+    候補ごとに 1 エンジンを張り、同じターゲットを交互に評価して bad 判定の
+    食い違いから符号検定の LLR を積む。|LLR| が閾値を超えた時点で両側を
+    止め、そこまでの部分指標を early_stopped=True 付きで返す。
+    評価順・seed が両側で同一なので common random numbers もそのまま効く。
+    """
+    from _usi_sweep import UsiEngine, build_common, resolve_hash_mib
+
+    with open(os.path.join(args.dataset, "targets.json"), "r", encoding="utf-8") as f:
+        targets = json.load(f)["targets"]
+    envadd = {"SHOGI_RNG_SEED": str(env_seed)} if env_seed is not None else {}
+    hash_mib = resolve_hash_mib(None, 2)
+    engines = []
+    drops = ([], [])
+    early = False
+    try:
+        for side, theta in (("plus", theta_plus), ("minus", theta_minus)):
+            opts = build_common(args.threads, 0, hash_mib)
+            opts.update({k: str(v) for k, v in theta.items()})
+            logfile = os.path.join(args.out, f"it{it}_{side}_sprt.log")
+            engines.append(UsiEngine(opts, envadd, logfile))
+        llr = 0.0
+        lw = math.log(2 * _SPRT_P1)  # discordant で plus 側が bad
+        ll = math.log(2 * (1 - _SPRT_P1))
+        for t in targets:
+            b = t.get("eval_cp")
+            if b is None:
+                continue
+            cp_p, _, _ = engines[0].evaluate(t["position"], args.byoyomi)
+            cp_m, _, _ = engines[1].evaluate(t["position"], args.byoyomi)
+            if cp_p is None or cp_m is None:
+                continue
+            dp = b - cp_p
+            dm = b - cp_m
+            drops[0].append(dp)
+            drops[1].append(dm)
+            bad_p = dp >= args.bad_th
+            bad_m = dm >= args.bad_th
+            if bad_p != bad_m:
+                llr += lw if bad_p else ll
+                if abs(llr) >= _SPRT_A:
+                    early = True
+                    break
+    finally:
+        for eng in engines:
+            eng.close()
+    return (
+        _require_drops(_drop_summary(drops[0], args.bad_th, early), f"it{it}_plus"),
+        _require_drops(_drop_summary(drops[1], args.bad_th, early), f"it{it}_minus"),
+    )
+
+
+def eval_candidate(theta, label, work_root, dataset_dir, args, env_seed=None):
+    """1 候補を targets 一式で評価し drop 指標 dict を返す。
+
+    work_dir は候補ごとに切るが、targets.json は dataset のものをパスで
+    直接渡す（候補ごとの symlink/copy は candidate 数分の filesystem 操作と
+    copy フォールバック時の MB 級複製にしかならない）。評価は
+    run_eval_targets_params、集計は summarize_drop_metrics を in-process
+    呼び出しする（候補ごとに CPython 子プロセスの起動 ~100ms×2 を払わない）。
+    """
+    work_dir = os.path.join(work_root, label)
+    os.makedirs(work_dir, exist_ok=True)
+    targets_path = os.path.join(dataset_dir, "targets.json")
+    pjson = json.dumps({k: str(v) for k, v in theta.items()})
+    # common random numbers: 同一イテレーションの ± 両候補へ同じ seed を
+    # 渡し、エンジン側の乱択（Zobrist 以外の tie-break 等）を共有して
+    # Jp−Jm の分散を下げる。seed はイテレーションごとに変える。
+    envadd = {"SHOGI_RNG_SEED": str(env_seed)} if env_seed is not None else {}
+    _run_params(
+        [
+            targets_path,
+            "--env-json",
+            json.dumps(envadd),
+            "--out",
+            work_dir,
+            "--params-json",
+            pjson,
+            "--name",
+            label,
+            "--byoyomi",
+            str(args.byoyomi),
+            "--threads",
+            str(args.threads),
+            "--jobs",
+            str(args.child_jobs),
+            "--quiet",
+        ]
+    )
+    return _require_drops(
+        _drop_metrics(
+            [work_dir, "--bad-th", str(args.bad_th), "--targets", targets_path]
+        ),
+        label,
+    )
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--params", required=True, help="パラメータ定義 JSON")
+    ap.add_argument("--dataset", required=True, help="targets.json のあるディレクトリ")
+    ap.add_argument("--out", default="spsa_work", help="作業/履歴ディレクトリ")
+    ap.add_argument("--iters", type=int, default=20, help="SPSA イテレーション数")
+    ap.add_argument("--a", type=float, default=0.5, help="更新ゲイン a")
+    ap.add_argument("--c", type=float, default=1.0, help="摂動ゲイン c")
+    ap.add_argument("--alpha", type=float, default=0.602, help="a_k 減衰指数")
+    ap.add_argument("--gamma", type=float, default=0.101, help="c_k 減衰指数")
+    ap.add_argument("--byoyomi", type=int, default=500, help="子評価の go byoyomi (ms)")
+    ap.add_argument("--threads", type=int, default=1, help="子評価のエンジン Threads")
+    ap.add_argument("--jobs", type=int, default=1, help="子評価の並列エンジン数")
+    ap.add_argument("--bad-th", type=int, default=300, help="bad 判定の drop 閾値 (cp)")
+    ap.add_argument("--seed", type=int, default=42, help="摂動方向の乱数 seed")
+    ap.add_argument(
+        "--spsa-parallel",
+        action="store_true",
+        help="+側と −側の候補評価を同時実行する（子の jobs は半分に抑える）",
+    )
+    ap.add_argument(
+        "--early-stop",
+        action="store_true",
+        help="± 候補をターゲット逐次で並走させ、SPRT で優劣確定なら打ち切る",
+    )
+    args = ap.parse_args(argv)
+
+    random.seed(args.seed)
+    with open(args.params, "r", encoding="utf-8") as f:
+        params_cfg = json.load(f)
+    keys = [p["name"] for p in params_cfg]
+    theta = {p["name"]: p["init"] for p in params_cfg}
+    os.makedirs(args.out, exist_ok=True)
+
+    if np is not None:
+        # パラメータを並列配列に落とし、摂動・クリップ・更新を要素演算で
+        # 行う。k が数個のうちは差は出ないが、k=100 級でも per-key の
+        # dict ループに戻らずに済む。方向サンプルは純 Python 経路と同じ
+        # random.choice 列を使い、両経路の結果を一致させる。
+        min_a = np.array([p["min"] for p in params_cfg], np.int64)
+        max_a = np.array([p["max"] for p in params_cfg], np.int64)
+        step_a = np.array([p["step"] for p in params_cfg], np.int64)
+        theta_a = np.array([p["init"] for p in params_cfg], np.int64)
+
+        def _clamp_a(v):
+            q = np.round((v - min_a) / step_a).astype(np.int64) * step_a + min_a
+            return np.clip(q, min_a, max_a)
+
+    # 並列時は 2 候補が同時にエンジンを回すので、子の並列度を半分にして
+    # Threads×jobs がコア数を超えないようにする。
+    args.child_jobs = max(1, args.jobs // 2) if args.spsa_parallel else args.jobs
+
+    hist_path = os.path.join(args.out, "spsa_history.jsonl")
+    with open(hist_path, "a", encoding="utf-8") as hist:
+        for it in range(1, args.iters + 1):
+            ak = args.a / (it + 1) ** args.alpha
+            ck = args.c / it ** args.gamma
+            if np is not None:
+                sign = np.fromiter(
+                    (random.choice((-1, 1)) for _ in keys), np.int64, len(keys)
+                )
+                d_a = np.maximum(1, np.round(ck * step_a).astype(np.int64)) * sign
+                delta = dict(zip(keys, d_a.tolist()))
+                theta_plus = dict(zip(keys, _clamp_a(theta_a + d_a).tolist()))
+                theta_minus = dict(zip(keys, _clamp_a(theta_a - d_a).tolist()))
+            else:
+                delta = {}
+                theta_plus = {}
+                theta_minus = {}
+                for p in params_cfg:
+                    k = p["name"]
+                    d = max(1, round(ck * p["step"])) * random.choice((-1, 1))
+                    delta[k] = d
+                    theta_plus[k] = clamp_step(
+                        theta[k] + d, p["min"], p["max"], p["step"]
+                    )
+                    theta_minus[k] = clamp_step(
+                        theta[k] - d, p["min"], p["max"], p["step"]
+                    )
+
+            # ± 両候補（と current）に同じ seed を使い、差分 Jp−Jm から
+            # エンジン側乱択由来のノイズを相殺する（common random numbers）。
+            env_seed = args.seed + it
+            if args.early_stop:
+                m_plus, m_minus = eval_pair_early_stop(
+                    theta_plus, theta_minus, it, args, env_seed
+                )
+            elif args.spsa_parallel:
+                # 子プロセス待ちは GIL を持たないのでスレッド 2 本で足りる。
+                with ThreadPoolExecutor(max_workers=2) as ex:
+                    fp = ex.submit(
+                        eval_candidate, theta_plus, f"it{it}_plus", args.out,
+                        args.dataset, args, env_seed,
+                    )
+                    fm = ex.submit(
+                        eval_candidate, theta_minus, f"it{it}_minus", args.out,
+                        args.dataset, args, env_seed,
+                    )
+                    m_plus, m_minus = fp.result(), fm.result()
+            else:
+                m_plus = eval_candidate(
+                    theta_plus, f"it{it}_plus", args.out, args.dataset, args, env_seed
+                )
+                m_minus = eval_candidate(
+                    theta_minus, f"it{it}_minus", args.out, args.dataset, args, env_seed
+                )
+            m_cur = eval_candidate(
+                theta, f"it{it}_cur", args.out, args.dataset, args, env_seed
+            )
+
+            jp = m_plus["mean_drop"]
+            jm = m_minus["mean_drop"]
+            jc = m_cur["mean_drop"]
+            if np is not None:
+                g_a = (jp - jm) / (2 * d_a)
+                theta_a = _clamp_a(
+                    theta_a - np.round(ak * g_a * step_a).astype(np.int64)
+                )
+                theta = dict(zip(keys, theta_a.tolist()))
+            else:
+                for p in params_cfg:
+                    k = p["name"]
+                    g = (jp - jm) / (2 * delta[k])
+                    theta[k] = clamp_step(
+                        theta[k] - round(ak * g * p["step"]),
+                        p["min"],
+                        p["max"],
+                        p["step"],
+                    )
+
+            rec = {"iter": it, "theta": dict(theta), "Jp": jp, "Jm": jm, "Jcur": jc}
+            if args.early_stop:
+                rec["early_stopped"] = bool(m_plus.get("early_stopped"))
+                rec["n_pair"] = m_plus["n"]
+            hist.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            hist.flush()
+            print(f"it{it}: Jp={jp} Jm={jm} Jcur={jc} theta={theta}")
+
+    print(f"done -> {hist_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""first_bad 局面で再評価エンジンが元対局の悪手を回避したかを集計する。
+
+summarize_true_blunders.py の `first_bad.csv`（origin ごとに base 評価が
+最初に悪化するターゲット）を起点に、元対局ログ（`--taikyoku-log`）で
+実際に指された手と、per-tag 再生ログ `<tag>__<profile>.log` の bestmove を
+突き合わせる。bestmove が元の悪手と異なれば avoided=1。
+
+per-tag 再生ログは tag 単位の再生レイアウトを前提とする。run_eval_targets
+の shard ログには tag ごとの bestmove 境界がないため、その場合 eval_move は
+空になり avoided は判定されない。
+
+summary.json / targets.json の読み込みは main() で 1 回だけ行い、
+(tag, profile) -> eval_cp の index を組み立ててループへ渡す（first_bad 行
+ごとの JSON 再パースを避ける）。
+
+使用例:
+    python3 scripts/analysis/summarize_avoidance.py sweep/ --profile gates \\
+        --taikyoku-log taikyoku-log/
+"""
+
+import argparse
+import csv
+import functools
+import json
+import mmap
+import os
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import jload, load_summary_indexed
+from summarize_true_blunders import run as _true_blunders_run
+
+BESTMOVE_RE = re.compile(r"bestmove\s+(\S+)")
+# position 行の前方探索用。ループ内の re.search へ生文字列を渡すと
+# 呼び出しごとに regex キャッシュを引くため、module scope で 1 回だけ
+# コンパイルしておく。
+POS_RE = re.compile(r"position\s+(?:startpos|sfen).*")
+
+# これ以上の origin ログは全文 decode + splitlines をやめ、mmap の byte 検索で
+# 走査する（触れたページだけがメモリへ載る）。
+_MMAP_TH = 64 << 20
+
+
+def read_targets(path):
+    """targets.json のターゲット list を返す。"""
+    return jload(path)["targets"]
+
+
+def ensure_first_bad_csv(outdir, bad_th, summary=None, targets_path=None):
+    """first_bad.csv が無ければ summarize_true_blunders.run を呼んで作る。
+
+    以前は subprocess でスクリプトごと起動していたが、in-process 呼び出しに
+    してインタプリタ起動と summary / targets の再パースを払わない。
+    呼び出し元 CLI の --summary / --targets（outdir 外のパス可）はそのまま
+    run へ転送する。
+    """
+    csv_path = os.path.join(outdir, "first_bad.csv")
+    if not os.path.exists(csv_path):
+        _true_blunders_run(outdir, bad_th=bad_th, summary=summary, targets_path=targets_path)
+    return csv_path
+
+
+def derive_first_bad_rows_from_summary(targets, rows, bad_th):
+    """読み込み済みの targets / summary rows から first_bad 行を組み立てる。
+
+    first_bad.csv を介したいわけではない呼び出し（--from-summary）用の
+    fallback。ロード済みデータを受け取り、ここでは再読込しない。
+    """
+    base_cp = {r["tag"]: r.get("eval_cp") for r in rows if r["profile"] == "base"}
+    by_origin = defaultdict(list)
+    for t in targets:
+        cp = base_cp.get(t["tag"])
+        if cp is None or cp > bad_th:
+            continue
+        by_origin[t.get("origin", "")].append(
+            {
+                "tag": t["tag"],
+                "origin": t.get("origin", ""),
+                "origin_ply": t.get("origin_ply", ""),
+                "back": int(t.get("back", 0)),
+                "base_cp": cp,
+            }
+        )
+    first_bad = []
+    for origin in sorted(by_origin):
+        cands = by_origin[origin]
+        cands.sort(key=lambda r: r["back"])
+        first_bad.append(cands[0])
+    return first_bad
+
+
+def parse_bestmoves_with_positions(lines, stop_at=None):
+    """対局ログから手ごとの (bestmove, last_cp, last_depth, pos_after) を復元する。
+
+    pos_after はその bestmove の後に現れた最初の `position ...` 行
+    （無ければ None）。stop_at を指定すると先頭 stop_at 手で打ち切る
+    （呼び出し側が必要とする ply が分かっている場合、残りをパースしない）。
+
+    info / bestmove 行は空白区切りの USI 出力なので、正規表現でなく
+    split + token 走査でパースする（行ごとの regex ディスパッチと
+    バックトラックを払わない）。
+    """
+    best = []
+    last_cp = None
+    last_depth = None
+    for i, l in enumerate(lines):
+        # " score cp " を先に見る（score なし・score mate の info 行を
+        # 部分文字列 1 回の走査で落とし、split まで進ませない）。
+        if " score cp " in l and (" info " in l or l.startswith("info")):
+            toks = l.split()
+            try:
+                depth = int(toks[toks.index("depth") + 1])
+                si = toks.index("score")
+                if toks[si + 1] != "cp":
+                    continue  # score mate 行は cp 更新しない（旧 regex 不一致と同じ）
+                cp = int(toks[si + 2])
+            except (ValueError, IndexError):
+                continue
+            last_depth = depth
+            last_cp = cp
+        elif "bestmove " in l:
+            toks = l.split()
+            try:
+                mv = toks[toks.index("bestmove") + 1]
+            except (ValueError, IndexError):
+                continue
+            pos_after = None
+            for j in range(i + 1, min(i + 80, len(lines))):
+                lj = lines[j]
+                if "position " not in lj:  # 安い部分文字列で regex を省く
+                    continue
+                pm = POS_RE.search(lj)
+                if pm is not None:
+                    pos_after = pm.group(0)
+                    break
+            best.append((mv, last_cp, last_depth, pos_after))
+            if stop_at is not None and len(best) >= stop_at:
+                break
+            last_cp = None
+            last_depth = None
+    return best
+
+
+def build_log_cache(first_bad_rows, targets_idx, log_dir):
+    """first_bad 行が参照する origin ログを 1 回ずつパースした cache を返す。
+
+    同じ origin を共有する tag が K 件あると、ログを都度開く実装では
+    同一ファイルを K 回読み直すことになる。ここで origin ごとに 1 回だけ
+    parse_bestmoves_with_positions を回し、結果の list を使い回す。
+    パースは origin ごとに必要な最大 origin_ply で打ち切る（対局後半の
+    ログは走査しない）。
+    """
+    need = {}
+    for row in first_bad_rows:
+        t = targets_idx.get(row["tag"], {})
+        origin = t.get("origin") or row.get("origin")
+        if not origin:
+            continue
+        ply = int(t.get("origin_ply") or row.get("origin_ply") or 0)
+        need[origin] = max(need.get(origin, 0), ply)
+    cache = {}
+    for origin, max_ply in need.items():
+        path = os.path.join(log_dir, origin)
+        if not os.path.exists(path):
+            cache[origin] = None
+            continue
+        stop_at = max_ply if max_ply > 0 else None
+        if os.path.getsize(path) >= _MMAP_TH:
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    cache[origin] = _parse_bestmoves_mmap(buf, stop_at)
+            continue
+        # 既定 8 KiB バッファの行イテレートは Python 側の read 呼び出しが
+        # ファイルサイズに比例して嵩む。1 MiB バッファで一括 read して
+        # splitlines する（syscall 回数と行オブジェクト生成を大きく削る）。
+        with open(
+            path, "r", encoding="utf-8", errors="ignore", buffering=1 << 20
+        ) as f:
+            cache[origin] = parse_bestmoves_with_positions(
+                f.read().splitlines(), stop_at
+            )
+    return cache
+
+
+def _parse_bestmoves_mmap(buf, stop_at=None):
+    """mmap した対局ログを byte 検索で走査する大ファイル用パス。
+
+    find/rfind は libc の memmem に落ちる SIMD 検索で、decode は一致した
+    行の小窓にだけ払う（全文 decode とファイルサイズ比例のピーク RSS を
+    避ける）。返す構造・stop_at の意味は parse_bestmoves_with_positions
+    と同じ。
+    """
+    best = []
+    pos = 0
+    n = len(buf)
+    while True:
+        bm = buf.find(b"bestmove ", pos)
+        if bm < 0:
+            break
+        eol = buf.find(b"\n", bm)
+        if eol < 0:
+            eol = n
+        toks = buf[bm + 9 : eol].split(None, 1)
+        if not toks:
+            pos = eol
+            continue
+        mv = toks[0].decode("ascii", "ignore")
+        # この bestmove より前で最後に「パースできた」score cp の info 行。
+        # 行パーサは depth 欠き行（info string ... score cp N 等）を読み
+        # 飛ばして直前の有効行の値を保持するため、ここでも最後の一致で
+        # 止めず、パースに失敗したら 1 つ前の一致へ rfind で遡る。
+        last_cp = None
+        last_depth = None
+        w = buf.rfind(b" score cp ", pos, bm)
+        while w >= 0:
+            ls = buf.rfind(b"\n", pos, w) + 1
+            le = buf.find(b"\n", w)
+            line = buf[ls : le if le >= 0 else n].decode("utf-8", "ignore")
+            if " info " in line or line.startswith("info"):
+                ltoks = line.split()
+                try:
+                    depth = int(ltoks[ltoks.index("depth") + 1])
+                    si = ltoks.index("score")
+                    if ltoks[si + 1] == "cp":
+                        last_depth = depth
+                        last_cp = int(ltoks[si + 2])
+                        break
+                except (ValueError, IndexError):
+                    pass
+            w = buf.rfind(b" score cp ", pos, ls)
+        # bestmove の後、次の bestmove までにある最初の position 行
+        nxt = buf.find(b"bestmove ", eol if eol < n else n)
+        pos_after = None
+        pp = buf.find(b"position ", eol, nxt if nxt >= 0 else n)
+        if pp >= 0:
+            ple = buf.find(b"\n", pp)
+            window = buf[pp : ple if ple >= 0 else n].decode("utf-8", "ignore")
+            pm = POS_RE.search(window)
+            if pm is not None:
+                pos_after = pm.group(0)
+        best.append((mv, last_cp, last_depth, pos_after))
+        if stop_at is not None and len(best) >= stop_at:
+            break
+        pos = eol
+    return best
+
+
+def original_bad_move_for_tag(tag_row, targets_idx, log_cache):
+    """元対局ログの origin_ply 手目に実際に指された手を返す（不明なら None）。"""
+    t = targets_idx.get(tag_row["tag"], {})
+    origin = t.get("origin") or tag_row.get("origin")
+    ply = int(t.get("origin_ply") or tag_row.get("origin_ply") or 0)
+    if not origin or ply <= 0:
+        return None
+    best = log_cache.get(origin)
+    if best is not None and ply - 1 < len(best):
+        return best[ply - 1][0]
+    return None
+
+
+def evaluated_bestmove(log_files, tag, profile):
+    """per-tag 再生ログ `<tag>__<profile>.log` の最後の bestmove を返す。
+
+    log_files は os.scandir で一括取得した {ファイル名: パス}。tag ごとに
+    os.path.exists で stat(2) を打たず、dict 引きだけで存在判定する。
+    必要なのは最後の bestmove 1 つだけなので、全行を頭から走査せず
+    ファイル末尾の 64 KiB を読んで後方検索する。見つからなければ窓を
+    倍々に広げて遡る（通常は read 1 回で済み、ログサイズに比例しない）。
+    """
+    log = log_files.get(f"{tag}__{profile}.log")
+    if log is None:
+        return None
+    with open(log, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        win = 1 << 16
+        while True:
+            start = max(0, size - win)
+            f.seek(start)
+            tail = f.read()
+            i = tail.rfind(b"bestmove ")
+            if i >= 0:
+                toks = tail[i + 9 :].split(None, 1)
+                if toks:
+                    return toks[0].decode("ascii", "ignore")
+                return None
+            if start == 0:
+                return None
+            win <<= 1
+
+
+def process_row(row, log_files, profile, targets_idx, log_cache, cp_idx):
+    """first_bad 1 行を回避判定して出力行 dict を返す。"""
+    tag = row["tag"]
+    orig_mv = original_bad_move_for_tag(row, targets_idx, log_cache)
+    eval_mv = evaluated_bestmove(log_files, tag, profile)
+    eval_cp = cp_idx.get((tag, profile))
+    t = targets_idx.get(tag, {})
+    return {
+        "tag": tag,
+        "origin": t.get("origin", row.get("origin", "")),
+        "origin_ply": t.get("origin_ply", row.get("origin_ply", "")),
+        "back": t.get("back", row.get("back", "")),
+        "orig_move": orig_mv or "",
+        "eval_move": eval_mv or "",
+        "avoided": int(
+            orig_mv is not None and eval_mv is not None and eval_mv != orig_mv
+        ),
+        "eval_cp": eval_cp if eval_cp is not None else "",
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("outdir", help="run_eval_targets の出力ディレクトリ")
+    ap.add_argument("--profile", default="base", help="回避判定に使う profile 名")
+    ap.add_argument("--bad-th", type=int, default=-300, help="悪手判定の cp 閾値（以下で bad）")
+    ap.add_argument("--taikyoku-log", default="taikyoku-log", help="元対局ログのディレクトリ")
+    ap.add_argument("--targets", default=None, help="targets.json（省略時は outdir 内）")
+    ap.add_argument("--summary", default=None, help="summary.json（省略時は outdir 内）")
+    ap.add_argument(
+        "--from-summary",
+        action="store_true",
+        help="first_bad.csv を介さず summary から first_bad 行を導出する",
+    )
+    args = ap.parse_args(argv)
+
+    targets = read_targets(args.targets or os.path.join(args.outdir, "targets.json"))
+    targets_idx = {t["tag"]: t for t in targets}
+
+    # summary.json はここで 1 回だけ読み、(tag, profile) -> eval_cp の index に
+    # しておく。first_bad 行ごとの線形走査・再パースはしない。
+    rows, cp_idx, _ = load_summary_indexed(args.outdir, args.summary)
+
+    if args.from_summary:
+        first_bad_rows = derive_first_bad_rows_from_summary(targets, rows, args.bad_th)
+    else:
+        csv_path = ensure_first_bad_csv(
+            args.outdir, args.bad_th, summary=args.summary, targets_path=args.targets
+        )
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            first_bad_rows = list(csv.DictReader(f))
+
+    log_cache = build_log_cache(first_bad_rows, targets_idx, args.taikyoku_log)
+
+    # per-tag 再生ログの存在確認を tag ごとの stat(2) でなく、outdir の
+    # 1 回の directory scan で済ませる（N stat -> 1 scandir）。
+    log_files = {
+        e.name: e.path
+        for e in os.scandir(args.outdir)
+        if e.name.endswith(f"__{args.profile}.log")
+    }
+
+    # tag ごとの処理は互いに独立で、残る実仕事は per-tag 再生ログの読みだけ
+    # （log_cache / cp_idx は読み取り専用の共有 dict）。I/O 待ちで GIL が
+    # 解放されるのでスレッドで足りる。ex.map は入力順を保つため、出力は
+    # 逐次実行と一致する。
+    worker = functools.partial(
+        process_row,
+        log_files=log_files,
+        profile=args.profile,
+        targets_idx=targets_idx,
+        log_cache=log_cache,
+        cp_idx=cp_idx,
+    )
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as ex:
+        rows_out = list(ex.map(worker, first_bad_rows))
+
+    out_csv = os.path.join(args.outdir, f"avoidance_{args.profile}.csv")
+    fields = ["tag", "origin", "origin_ply", "back", "orig_move", "eval_move", "avoided", "eval_cp"]
+    with open(out_csv, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows_out)
+
+    judged = [r for r in rows_out if r["orig_move"] and r["eval_move"]]
+    avoided = sum(r["avoided"] for r in judged)
+    print(
+        json.dumps(
+            {
+                "n": len(rows_out),
+                "judged": len(judged),
+                "avoided": avoided,
+                "avoided_rate": avoided / len(judged) if judged else None,
+            },
+            ensure_ascii=False,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
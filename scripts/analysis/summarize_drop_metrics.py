@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""`run_eval_targets_params.py` の summary から評価値ドロップ指標を集計する。
+
+targets.json に記録された抽出時の評価値 (`eval_cp`) を基準に、再評価の
+`eval_cp` がどれだけ下がったか（drop = 基準 - 再評価）を集計し、
+`--bad-th` 以上落ちたターゲット数・割合を JSON で stdout へ出力する。
+`spsa_optimize.py` が候補パラメータの目的関数としてこの出力を読む。
+
+使用例:
+    python3 scripts/analysis/summarize_drop_metrics.py work/it1_plus --bad-th 300
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics as stats
+import sys
+
+try:
+    import ijson
+except ImportError:  # ijson なし環境では一括ロードへフォールバック
+    ijson = None
+
+try:
+    import numpy as np
+except ImportError:  # numpy なし環境では純 Python パスへフォールバック
+    np = None
+
+try:
+    import orjson
+except ImportError:  # orjson なし環境では stdlib json へフォールバック
+    orjson = None
+
+# これ以上の summary は ijson でストリーミングし、row dict の一括実体化を
+# 避ける。それ未満は一括ロード（orjson があればそれ）が最速。
+_STREAM_TH = 256 << 20
+
+
+def _iter_results(path):
+    """summary の results 行を逐次 yield する。"""
+    if ijson is not None and os.path.getsize(path) >= _STREAM_TH:
+        with open(path, "rb") as f:
+            yield from ijson.items(f, "results.item")
+        return
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+    yield from data["results"]
+
+
+def run(argv=None):
+    """指標を計算して dict で返す（in-process 呼び出し用エントリ）。"""
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("work_dir", help="run_eval_targets_params の出力ディレクトリ")
+    ap.add_argument("--bad-th", type=int, default=300, help="bad 判定の drop 閾値 (cp)")
+    ap.add_argument(
+        "--targets", default=None, help="targets.json（省略時は work_dir 内を使う）"
+    )
+    ap.add_argument(
+        "--summary", default=None, help="summary JSON（省略時は work_dir 内の summary_*.json）"
+    )
+    args = ap.parse_args(argv)
+
+    summary_path = args.summary
+    if summary_path is None:
+        cands = sorted(glob.glob(os.path.join(args.work_dir, "summary_*.json")))
+        if not cands:
+            raise FileNotFoundError(f"no summary_*.json in {args.work_dir}")
+        summary_path = cands[0]
+    targets_path = args.targets or os.path.join(args.work_dir, "targets.json")
+
+    if orjson is not None:
+        with open(targets_path, "rb") as f:
+            tdata = orjson.loads(f.read())
+    else:
+        with open(targets_path, "r", encoding="utf-8") as f:
+            tdata = json.load(f)
+    base = {t["tag"]: t.get("eval_cp") for t in tdata["targets"]}
+
+    drops = []
+    for r in _iter_results(summary_path):
+        cp = r.get("eval_cp")
+        b = base.get(r["tag"])
+        if cp is None or b is None:
+            continue
+        drops.append(b - cp)
+
+    # 集計は numpy があれば 1 本のベクトルパスで行う（要素ごとの Python
+    # ループを排除）。int64 の和は桁あふれせず、平均は両パスとも
+    # 「正確な整数和 / n」なので fallback と bit 一致する。
+    if np is not None and drops:
+        arr = np.asarray(drops, dtype=np.int64)
+        bad = int((arr >= args.bad_th).sum())
+        mean_drop = float(arr.mean())
+        max_drop = int(arr.max())
+    else:
+        bad = sum(1 for d in drops if d >= args.bad_th)
+        mean_drop = float(stats.mean(drops)) if drops else None
+        max_drop = max(drops) if drops else None
+    return {
+        "n": len(drops),
+        "mean_drop": mean_drop,
+        "max_drop": max_drop,
+        "bad": bad,
+        "bad_rate": bad / len(drops) if drops else None,
+    }
+
+
+def main(argv=None):
+    print(json.dumps(run(argv), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
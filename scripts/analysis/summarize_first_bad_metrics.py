@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""first_bad ターゲット群の再評価行からプロファイル別の指標を集計する。
+
+summarize_true_blunders.py の `first_bad.csv`（origin ごとに base 評価が
+最初に悪化するターゲット）に載った tag について、summary.json の指定
+profile 行から valid / bad 件数・平均 cp・平均 depth を計算し JSON で
+stdout へ出力する。
+
+集計本体 compute_metrics は numpy + numba がある環境では `@njit` 済みの
+単一パス reducer に落とす（行 dict への属性アクセスを ndarray 化してから
+渡す）。どちらかが無ければ純 Python ループへフォールバックし、結果は
+一致する。
+
+使用例:
+    python3 scripts/analysis/summarize_first_bad_metrics.py sweep/ --profile gates
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import defaultdict
+
+from summarize_true_blunders import run as _true_blunders_run
+
+try:
+    import ijson
+except ImportError:  # ijson なし環境では一括ロードへフォールバック
+    ijson = None
+
+try:
+    import numpy as np
+except ImportError:  # numpy なし環境では純 Python パスへフォールバック
+    np = None
+
+try:
+    import orjson
+except ImportError:  # orjson なし環境では stdlib json へフォールバック
+    orjson = None
+
+# これ以上の summary は ijson でストリーミングし、profile フィルタを通過した
+# 行だけを実体化する（summarize_drop_metrics と同じ閾値）。
+_STREAM_TH = 256 << 20
+
+_reduce = None
+if np is not None:
+    try:
+        from numba import float64, int32, int64, njit, types
+
+        # 宣言時にシグネチャを与えて eager compile し、初回呼び出しの
+        # コンパイル待ちを import 時（cache=True なら初回のみ）に寄せる。
+        @njit(
+            types.Tuple((int64, int64, float64, int64, int64))(
+                float64[:], int32[:], int64
+            ),
+            cache=True,
+        )
+        def _reduce(cp, d, bad_th):
+            valid = 0
+            bad = 0
+            cp_sum = 0.0
+            depth_n = 0
+            depth_sum = 0
+            for i in range(cp.shape[0]):
+                v = cp[i]
+                if v == v:  # NaN でない = eval_cp あり
+                    valid += 1
+                    cp_sum += v
+                    if v <= bad_th:
+                        bad += 1
+                if d[i] >= 0:
+                    depth_n += 1
+                    depth_sum += d[i]
+            return valid, bad, cp_sum, depth_n, depth_sum
+
+    except ImportError:  # numba なしなら ndarray 化もせず純 Python で集計
+        _reduce = None
+
+
+def _jload(path):
+    """JSON ファイルを読む（orjson があれば bytes 経由の fast path）。"""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_targets(outdir, targets=None):
+    """targets.json のターゲット list を返す。"""
+    path = targets or os.path.join(outdir, "targets.json")
+    return _jload(path)["targets"]
+
+
+def load_summary(outdir, summary=None, profile=None):
+    """summary.json の results を返す（profile 指定時はその行だけ）。
+
+    巨大な summary は ijson でストリーミングし、フィルタ通過行だけを
+    実体化する（全 row dict を一度に持たない）。
+    """
+    path = summary or os.path.join(outdir, "summary.json")
+    if ijson is not None and os.path.getsize(path) >= _STREAM_TH:
+        with open(path, "rb") as f:
+            it = ijson.items(f, "results.item")
+            if profile is not None:
+                return [r for r in it if r["profile"] == profile]
+            return list(it)
+    rows = _jload(path)["results"]
+    if profile is not None:
+        rows = [r for r in rows if r["profile"] == profile]
+    return rows
+
+
+def ensure_first_bad_csv(outdir, bad_th, summary=None, targets_path=None):
+    """first_bad.csv が無ければ summarize_true_blunders.run を呼んで作る。
+
+    summarize_avoidance と同じく in-process 呼び出し（subprocess 起動と
+    summary / targets の再パースを払わない）。呼び出し元 CLI の
+    --summary / --targets（outdir 外のパス可）はそのまま run へ転送する。
+    """
+    csv_path = os.path.join(outdir, "first_bad.csv")
+    if not os.path.exists(csv_path):
+        _true_blunders_run(outdir, bad_th=bad_th, summary=summary, targets_path=targets_path)
+    return csv_path
+
+
+def derive_first_bad_tags_from_summary(targets, rows, bad_th):
+    """first_bad.csv を介さず、ロード済み targets / summary から tag を導出する。"""
+    base_cp = {r["tag"]: r.get("eval_cp") for r in rows if r["profile"] == "base"}
+    by_origin = defaultdict(list)
+    for t in targets:
+        cp = base_cp.get(t["tag"])
+        if cp is None or cp > bad_th:
+            continue
+        by_origin[t.get("origin", "")].append((int(t.get("back", 0)), t["tag"]))
+    return [min(by_origin[origin])[1] for origin in sorted(by_origin)]
+
+
+def compute_metrics(rows, bad_th):
+    """summary 行の list から valid / bad / 平均 cp / 平均 depth を単一パスで出す。"""
+    if _reduce is not None:
+        cp = np.fromiter(
+            (r["eval_cp"] if r.get("eval_cp") is not None else np.nan for r in rows),
+            dtype=np.float64,
+            count=len(rows),
+        )
+        d = np.fromiter(
+            (r["depth"] if r.get("depth") is not None else -1 for r in rows),
+            dtype=np.int32,
+            count=len(rows),
+        )
+        valid, bad, cp_sum, depth_n, depth_sum = _reduce(cp, d, bad_th)
+    else:
+        valid = bad = depth_n = depth_sum = 0
+        cp_sum = 0.0
+        for r in rows:
+            cp = r.get("eval_cp")
+            if cp is not None:
+                valid += 1
+                cp_sum += cp
+                if cp <= bad_th:
+                    bad += 1
+            depth = r.get("depth")
+            if depth is not None and depth >= 0:
+                depth_n += 1
+                depth_sum += depth
+    return {
+        "n": len(rows),
+        "valid": valid,
+        "bad": bad,
+        "bad_rate": bad / valid if valid else None,
+        "mean_cp": cp_sum / valid if valid else None,
+        "mean_depth": depth_sum / depth_n if depth_n else None,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("outdir", help="run_eval_targets の出力ディレクトリ")
+    ap.add_argument("--profile", default="base", help="集計対象の profile 名")
+    ap.add_argument("--bad-th", type=int, default=-300, help="悪手判定の cp 閾値（以下で bad）")
+    ap.add_argument("--summary", default=None, help="summary.json（省略時は outdir 内）")
+    ap.add_argument("--targets", default=None, help="targets.json（省略時は outdir 内）")
+    ap.add_argument(
+        "--from-summary",
+        action="store_true",
+        help="first_bad.csv を介さず summary から first_bad tag を導出する",
+    )
+    args = ap.parse_args(argv)
+
+    if args.from_summary:
+        # derive には base 行も要るため全 profile を読む。
+        rows = load_summary(args.outdir, args.summary)
+        targets = load_targets(args.outdir, args.targets)
+        tags = set(derive_first_bad_tags_from_summary(targets, rows, args.bad_th))
+        picked = [r for r in rows if r["tag"] in tags and r["profile"] == args.profile]
+    else:
+        csv_path = ensure_first_bad_csv(
+            args.outdir, args.bad_th, summary=args.summary, targets_path=args.targets
+        )
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            tags = {r["tag"] for r in csv.DictReader(f)}
+        rows = load_summary(args.outdir, args.summary, profile=args.profile)
+        picked = [r for r in rows if r["tag"] in tags]
+    print(json.dumps(compute_metrics(picked, args.bad_th), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
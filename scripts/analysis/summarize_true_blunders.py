@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""`run_eval_targets.py` の summary から真の悪手と救済候補を分類する。
+
+targets.json の各ターゲットについて base / rootfull / gates の再評価値を
+突き合わせ、base 評価が `--bad-th` 以下へ沈む局面を悪手系列として分類する:
+
+- `true_blunder`: base が悪く、rootfull / gates でも `--bad-th` を超えられない
+- `rescue_by_gates_or_rootfull`: base は悪いが rootfull か gates なら持ち直す
+  （dg = 救済側の最良 cp - base cp）
+- `ok`: base 評価が `--bad-th` より良い
+
+出力は 2 つの CSV:
+
+- `first_bad.csv`: origin（元対局ログ）ごとに base が最初に悪化する行
+  （back 最小）。summarize_avoidance.py / summarize_first_bad_metrics.py が読む。
+- `rescue_candidates.csv`: 救済候補を dg 降順（同値は back 昇順）で並べたもの。
+
+使用例:
+    python3 scripts/analysis/summarize_true_blunders.py sweep/ --bad-th -300
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import defaultdict
+
+from _common import jload, load_summary_indexed
+
+FIELDS = "tag,origin,origin_ply,back,base_cp,rootfull_cp,gates_cp,dg,severity"
+
+
+def load_results(outdir, summary=None):
+    """summary.json を 1 回読み、{(tag, profile): row} の index を返す。"""
+    return load_summary_indexed(outdir, summary)[2]
+
+
+def load_targets(outdir, targets=None):
+    """targets.json のターゲット list を返す。"""
+    path = targets or os.path.join(outdir, "targets.json")
+    return jload(path)["targets"]
+
+
+def wcsv(path, rows, header):
+    """rows（dict の list）を header 順の CSV として書く。
+
+    手組みの join だとフィールドにカンマや引用符が混ざったとき壊れる上、
+    行ごとに header.split を払っていた。quoting は csv モジュールに任せ、
+    fieldnames は 1 回だけ分解する。
+    """
+    fields = header.split(",")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore", lineterminator="\n")
+        w.writeheader()
+        w.writerows(rows)
+
+
+def build_records(targets, results_idx, bad_th):
+    """ターゲットごとの分類レコードを組み立てる（base 評価が無い行は除く）。"""
+    records = []
+    for t in targets:
+        tag = t["tag"]
+        base = results_idx.get((tag, "base"), {}).get("eval_cp")
+        if base is None:
+            continue
+        rootfull = results_idx.get((tag, "rootfull"), {}).get("eval_cp")
+        gates = results_idx.get((tag, "gates"), {}).get("eval_cp")
+        rescues = [cp for cp in (rootfull, gates) if cp is not None]
+        best_rescue = max(rescues) if rescues else None
+        if base > bad_th:
+            severity = "ok"
+        elif best_rescue is not None and best_rescue > bad_th:
+            severity = "rescue_by_gates_or_rootfull"
+        else:
+            severity = "true_blunder"
+        records.append(
+            {
+                "tag": t["tag"],
+                "origin": t.get("origin", ""),
+                "origin_ply": t.get("origin_ply", ""),
+                "back": int(t.get("back", 0)),
+                "base_cp": base,
+                "rootfull_cp": rootfull if rootfull is not None else "",
+                "gates_cp": gates if gates is not None else "",
+                "dg": (best_rescue - base) if best_rescue is not None else None,
+                "severity": severity,
+            }
+        )
+    return records
+
+
+def run(outdir, bad_th=-300, summary=None, targets_path=None):
+    """分類を実行して CSV 2 つを書き、(records, rescue_candidates, first_bad) を返す。
+
+    summarize_avoidance / summarize_first_bad_metrics が in-process で呼ぶ
+    エントリ（subprocess 起動と summary / targets の再パースを払わない）。
+    """
+    targets = load_targets(outdir, targets_path)
+    results_idx = load_results(outdir, summary)
+    records = build_records(targets, results_idx, bad_th)
+
+    # 救済候補の抽出と origin ごとの bad 行グループ化は records への
+    # 1 パスに融合する（filter 内包表記 2 本で同じ list を二度舐めない）。
+    rescue_candidates = []
+    by_origin = defaultdict(list)
+    for r in records:
+        if r["severity"] == "rescue_by_gates_or_rootfull" and r["dg"] is not None:
+            rescue_candidates.append(r)
+        if r["base_cp"] <= bad_th:
+            by_origin[r["origin"]].append(r)
+    rescue_candidates.sort(key=lambda r: (-r["dg"], r["back"]))
+
+    # origin ごとに base が最初に悪化する行 = bad 行のうち back 最小のもの。
+    # 必要なのは各グループの先頭 1 件だけなので、グループ内 sort でなく
+    # min の 1 パス選択にする（O(n log n) -> O(n)、同着は先勝ちで sort と同じ）。
+    first_bad = [
+        min(by_origin[origin], key=lambda r: r["back"]) for origin in sorted(by_origin)
+    ]
+
+    wcsv(os.path.join(outdir, "rescue_candidates.csv"), rescue_candidates, FIELDS)
+    wcsv(os.path.join(outdir, "first_bad.csv"), first_bad, FIELDS)
+    return records, rescue_candidates, first_bad
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("outdir", help="run_eval_targets の出力ディレクトリ")
+    ap.add_argument("--bad-th", type=int, default=-300, help="悪手判定の cp 閾値（以下で bad）")
+    ap.add_argument("--summary", default=None, help="summary.json（省略時は outdir 内）")
+    ap.add_argument("--targets", default=None, help="targets.json（省略時は outdir 内）")
+    args = ap.parse_args(argv)
+
+    records, rescue_candidates, first_bad = run(
+        args.outdir, args.bad_th, args.summary, args.targets
+    )
+    print(
+        json.dumps(
+            {
+                "records": len(records),
+                "true_blunder": sum(1 for r in records if r["severity"] == "true_blunder"),
+                "rescue_candidates": len(rescue_candidates),
+                "first_bad": len(first_bad),
+            },
+            ensure_ascii=False,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())